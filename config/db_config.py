@@ -21,6 +21,9 @@ class DBConfig:
     POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))  # Number of connections in the pool
     POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))  # Recycle connections after 1 hour
 
+    # Query logging: 'summary' logs row counts and timings, 'full' logs statements and results
+    LOG_MODE = os.getenv('DB_LOG_MODE', 'summary')
+
     @classmethod
     def get_config(cls):
         """
@@ -33,7 +36,8 @@ class DBConfig:
             'password': cls.PASSWORD,
             'database': cls.DATABASE,
             'pool_size': cls.POOL_SIZE,
-            'pool_recycle': cls.POOL_RECYCLE
+            'pool_recycle': cls.POOL_RECYCLE,
+            'log_mode': cls.LOG_MODE
         }
 
     @classmethod
@@ -50,12 +54,16 @@ class DBConfig:
         if not isinstance(cls.PORT, int) or cls.PORT <= 0:
             raise ValueError("DB_PORT must be a positive integer.")
 
-        if not isinstance(cls.POOL_SIZE, int) or cls.POOL_SIZE <= 0:
-            raise ValueError("DB_POOL_SIZE must be a positive integer.")
+        # The primary connection, a streaming reader and a writer can be checked out at once
+        if not isinstance(cls.POOL_SIZE, int) or cls.POOL_SIZE < 3:
+            raise ValueError("DB_POOL_SIZE must be an integer of at least 3.")
 
         if not isinstance(cls.POOL_RECYCLE, int) or cls.POOL_RECYCLE <= 0:
             raise ValueError("DB_POOL_RECYCLE must be a positive integer.")
 
+        if cls.LOG_MODE not in ('full', 'summary'):
+            raise ValueError("DB_LOG_MODE must be either 'full' or 'summary'.")
+
 
 # Validate configuration on import
 DBConfig.validate()
@@ -0,0 +1,163 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCacheBackend:
+    def __init__(self, path):
+        """
+        Persist cached responses in a SQLite file so they survive restarts.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._connection.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key):
+        """
+        Return the (value, expires_at) stored for key, or None if missing or expired.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM response_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM response_cache")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=2048, default_ttl=3600, ttl_rules=None, backend=None):
+        """
+        Size-bounded LRU cache with per-key time-to-live and an optional persistent backend.
+
+        Args:
+            max_entries (int): Maximum number of responses kept in memory.
+            default_ttl (int): Seconds a response stays fresh when no rule matches.
+            ttl_rules (list): (regex, ttl_seconds) pairs checked in order against the key.
+                A ttl of 0 disables caching for matching keys.
+            backend: Optional persistent store such as SQLiteCacheBackend.
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules or [])]
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (value, expires_at), least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "expired": 0}
+
+    def ttl_for(self, key):
+        """
+        Return the time-to-live in seconds for a key according to the configured rules.
+        """
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(key):
+                return ttl
+        return self.default_ttl
+
+    def _remember(self, key, value, expires_at):
+        """Store an entry in memory, evicting the least recently used ones. Caller holds the lock."""
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._stats["expired"] += 1
+
+        if self.backend is not None:
+            stored = self.backend.get(key)
+            if stored is not None:
+                value, expires_at = stored
+                with self._lock:
+                    self._remember(key, value, expires_at)
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                return value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        """
+        Cache value under key for the TTL that applies to the key.
+        """
+        ttl = self.ttl_for(key)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist cache entry {key}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def close(self):
+        """
+        Close the persistent backend, if any. The in-memory entries are kept.
+        """
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current number of in-memory entries.
+        """
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries}
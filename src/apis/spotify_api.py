@@ -1,8 +1,13 @@
+import os
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from src.apis.rate_limiter import TokenBucket
+from src.apis.response_cache import ResponseCache, SQLiteCacheBackend
 from src.models.song import Song
 from config.config import Config
-import time
 
 
 def _get_access_token():
@@ -26,43 +31,134 @@ def _get_access_token():
 
 
 class SpotifyAPI:
-    def __init__(self):
+    # Maximum number of IDs accepted by Spotify's "several items" endpoints
+    ARTISTS_PER_REQUEST = 50
+    ALBUMS_PER_REQUEST = 20
+    TRACKS_PER_REQUEST = 50
+    PAGE_LIMIT = 50  # Largest page size accepted by the albums and tracks listing endpoints
+
+    # Shared by every SpotifyAPI instance so concurrent clients stay under one request budget
+    rate_limiter = TokenBucket(rate=float(os.getenv('SPOTIFY_RATE_LIMIT', 10)))
+
+    # How long responses stay fresh, by endpoint (first match wins)
+    CACHE_TTLS = [
+        (r'/v1/artists/[^/?]+/albums', 6 * 3600),  # Discographies change when something is released
+        (r'/v1/artists', 10 * 60),  # Follower counts move quickly
+        (r'/v1/albums', 30 * 24 * 3600),  # Album metadata and tracklists are effectively immutable
+        (r'/v1/tracks', 24 * 3600),
+    ]
+
+    def __init__(self, max_workers=4, cache=None):
+        """
+        Initialize the Spotify client.
+
+        Args:
+            max_workers (int): Number of requests issued in parallel by batch and
+                pagination helpers. Use 1 for strictly sequential requests.
+            cache (ResponseCache): Response cache, left open by close() so it can outlive
+                this client. Defaults to SpotifyAPI.default_cache(), owned and closed by the client.
+        """
+        self.max_workers = max_workers
+        self._token_lock = threading.Lock()
         self.token = _get_access_token()
         self.token_expiry = datetime.now() + timedelta(minutes=55)  # Tokens expire after 1 hour
-        self.cache = {}  # Simple cache to store API responses
-        self.rate_limit_reset = None  # Track rate limit reset time
+        self._owns_cache = cache is None
+        self.cache = cache if cache is not None else self.default_cache()
+
+        # Keep-alive session shared by all worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self._executor = None
 
-    def _check_token_expiry(self):
+    @classmethod
+    def default_cache(cls):
+        """
+        Build the default response cache: an in-memory LRU cache, persisted to SQLite when
+        SPOTIFY_CACHE_PATH is set.
+        """
+        cache_path = os.getenv('SPOTIFY_CACHE_PATH')
+        return ResponseCache(
+            max_entries=int(os.getenv('SPOTIFY_CACHE_SIZE', 2048)),
+            ttl_rules=cls.CACHE_TTLS,
+            backend=SQLiteCacheBackend(cache_path) if cache_path else None
+        )
+
+    def _check_token_expiry(self, force=False):
         """
         Check if the token is about to expire and refresh it if necessary.
+        Only one thread refreshes; the others wait and reuse the new token.
         """
-        if datetime.now() >= self.token_expiry:
+        if not force and datetime.now() < self.token_expiry:
+            return
+        stale_token = self.token
+        with self._token_lock:
+            if self.token != stale_token or (not force and datetime.now() < self.token_expiry):
+                return  # Another thread already refreshed it
             self.token = _get_access_token()
             self.token_expiry = datetime.now() + timedelta(minutes=55)
 
-    def _make_request(self, url):
+    def _map(self, func, items):
         """
-        Make a request to the Spotify API with rate limiting and token management.
+        Apply func to every item, in parallel when max_workers > 1. Results keep the input order.
         """
-        self._check_token_expiry()
+        if self.max_workers <= 1:
+            return map(func, items)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor.map(func, items)
 
-        if url in self.cache:
-            return self.cache[url]
+    def close(self):
+        """
+        Release the worker threads, the HTTP session and, if the client created it, the cache.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+        if self._owns_cache:
+            self.cache.close()
+
+    def _make_request(self, url, use_cache=True):
+        """
+        Make a request to the Spotify API with rate limiting and token management.
+        Safe to call from several threads at once.
 
-        headers = {'Authorization': f'Bearer {self.token}'}
-        response = requests.get(url, headers=headers)
+        Args:
+            url (str): Request URL, also the cache key.
+            use_cache (bool): False bypasses the response cache for this request.
+        """
+        if use_cache:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached
 
-        if response.status_code == 429:  # Rate limit exceeded
-            reset_time = int(response.headers.get('Retry-After', 1))
-            print(f"Rate limit exceeded. Retrying after {reset_time} seconds.")
-            time.sleep(reset_time)
-            return self._make_request(url)
+        token_refreshed = False
+        while True:
+            self._check_token_expiry()
+            self.rate_limiter.acquire()
+            headers = {'Authorization': f'Bearer {self.token}'}
+            response = self.session.get(url, headers=headers)
+
+            if response.status_code == 429:  # Rate limit exceeded
+                reset_time = int(response.headers.get('Retry-After', 1))
+                print(f"Rate limit exceeded. Retrying after {reset_time} seconds.")
+                self.rate_limiter.pause(reset_time)
+                continue
+
+            if response.status_code == 401 and not token_refreshed:  # Token revoked early
+                self._check_token_expiry(force=True)
+                token_refreshed = True
+                continue
+            break
 
         if response.status_code != 200:
             raise Exception(f"Failed to fetch data: {response.status_code} {response.text}")
 
-        self.cache[url] = response.json()  # Cache the response
-        return response.json()
+        data = response.json()
+        if use_cache:
+            self.cache.set(url, data)  # Cache the response
+        return data
 
     def fetch_artist_data(self, artist_id):
         """
@@ -78,46 +174,164 @@ class SpotifyAPI:
             "timestamp": datetime.now()
         }
 
+    def _fetch_several(self, endpoint, ids, chunk_size):
+        """
+        Fetch entities from one of Spotify's "several items" endpoints (/v1/{endpoint}?ids=...).
+        Accepts any number of IDs and returns a dictionary keyed by ID. Unknown IDs are left out.
+
+        Each entity is cached on its own, under its single-item URL (/v1/{endpoint}/{id}), so a
+        change in the set of requested IDs does not invalidate the entities already fetched.
+        Only the IDs missing from the cache are requested, chunk_size per request.
+        """
+        unique_ids = list(dict.fromkeys(entity_id for entity_id in ids if entity_id))
+        results = {}
+        missing_ids = []
+        for entity_id in unique_ids:
+            item = self.cache.get(f'https://api.spotify.com/v1/{endpoint}/{entity_id}')
+            if item is not None:
+                results[item['id']] = item
+            else:
+                missing_ids.append(entity_id)
+
+        chunks = [missing_ids[i:i + chunk_size] for i in range(0, len(missing_ids), chunk_size)]
+        responses = self._map(
+            lambda chunk: self._make_request(f'https://api.spotify.com/v1/{endpoint}?ids={",".join(chunk)}',
+                                             use_cache=False),
+            chunks
+        )
+        for chunk, response in zip(chunks, responses):
+            # Items come back in request order, with null for IDs Spotify does not know
+            for entity_id, item in zip(chunk, response[endpoint]):
+                if item:
+                    self.cache.set(f'https://api.spotify.com/v1/{endpoint}/{entity_id}', item)
+                    results[item['id']] = item
+        return results
+
+    def fetch_artists(self, artist_ids):
+        """
+        Fetch full artist objects for many artists, 50 per request.
+        """
+        return self._fetch_several('artists', artist_ids, self.ARTISTS_PER_REQUEST)
+
+    def fetch_albums(self, album_ids):
+        """
+        Fetch full album objects, including their first page of tracks, 20 per request.
+        """
+        return self._fetch_several('albums', album_ids, self.ALBUMS_PER_REQUEST)
+
+    def fetch_tracks(self, track_ids):
+        """
+        Fetch full track objects for many tracks, 50 per request.
+        """
+        return self._fetch_several('tracks', track_ids, self.TRACKS_PER_REQUEST)
+
+    def fetch_artists_data(self, artist_ids):
+        """
+        Fetch follower details for many artists. Returns a dictionary keyed by artist ID
+        with the same shape as fetch_artist_data().
+        """
+        timestamp = datetime.now()
+        return {
+            artist_id: {
+                "artist_id": artist_id,
+                "artist_name": artist['name'],
+                "followers": artist['followers']['total'],
+                "timestamp": timestamp
+            }
+            for artist_id, artist in self.fetch_artists(artist_ids).items()
+        }
+
     def fetch_all_artist_info(self, artist_id):
         """
         Fetch all possible information about an artist, including albums and tracks.
+        Each album carries its own "tracks" list; "tracks" at the top level holds all of them.
         """
-        artist_data = self.fetch_artist_data(artist_id)
-        albums = self.fetch_albums_by_artist(artist_id)
-        tracks = []
+        artist = self.fetch_artists([artist_id])[artist_id]
+        albums = list(self.iter_albums_by_artist(artist_id, concurrent=True))
+        full_albums = self.fetch_albums(album['id'] for album in albums)
 
+        # The albums endpoint only embeds the first page of tracks; fetch the rest in parallel
+        long_album_ids = [
+            album_id for album_id, full_album in full_albums.items()
+            if full_album.get('tracks', {}).get('next')
+        ]
+        long_album_tracks = dict(zip(long_album_ids, self._map(self.fetch_tracks_by_album, long_album_ids)))
+
+        tracks = []
+        albums_with_tracks = []
         for album in albums:
-            album_id = album['id']
-            album_tracks = self.fetch_tracks_by_album(album_id)
+            album_tracks = long_album_tracks.get(album['id'])
+            if album_tracks is None:
+                album_tracks = full_albums.get(album['id'], {}).get('tracks', {}).get('items', [])
+            # Copy the album: the paged dicts are the objects held by the response cache
+            albums_with_tracks.append({**album, 'tracks': album_tracks})
             tracks.extend(album_tracks)
 
         return {
             "artist": {
-                "artist_id": artist_data['artist_id'],
-                "name": artist_data['name'],
-                "followers": artist_data['followers'],
-                "genres": artist_data['genres'],
-                "popularity": artist_data['popularity'],
-                "timestamp": artist_data['timestamp'].isoformat()  # Convert datetime to string
+                "artist_id": artist_id,
+                "name": artist['name'],
+                "followers": artist['followers']['total'],
+                "genres": artist.get('genres', []),
+                "popularity": artist.get('popularity'),
+                "timestamp": datetime.now().isoformat()
             },
-            "albums": albums,
+            "albums": albums_with_tracks,
             "tracks": tracks
         }
 
+    def _paginate(self, url, limit=PAGE_LIMIT, concurrent=False):
+        """
+        Yield every item of a Spotify paging object, one page at a time.
+
+        Pages are followed through their "next" links. With concurrent=True the first page's
+        "total" is used to request the remaining pages by offset on the worker pool; items are
+        still yielded in order.
+        """
+        separator = '&' if '?' in url else '?'
+        first_page = self._make_request(f'{url}{separator}limit={limit}&offset=0')
+        yield from first_page['items']
+
+        if not concurrent:
+            next_url = first_page.get('next')
+            while next_url:
+                page = self._make_request(next_url)
+                yield from page['items']
+                next_url = page.get('next')
+            return
+
+        page_urls = [
+            f'{url}{separator}limit={limit}&offset={offset}'
+            for offset in range(limit, first_page.get('total', 0), limit)
+        ]
+        for page in self._map(self._make_request, page_urls):
+            yield from page['items']
+
+    def iter_albums_by_artist(self, artist_id, concurrent=False):
+        """
+        Yield every album for a given artist, following pagination.
+        """
+        url = f'https://api.spotify.com/v1/artists/{artist_id}/albums'
+        return self._paginate(url, concurrent=concurrent)
+
+    def iter_tracks_by_album(self, album_id, concurrent=False):
+        """
+        Yield every track for a given album, following pagination.
+        """
+        url = f'https://api.spotify.com/v1/albums/{album_id}/tracks'
+        return self._paginate(url, concurrent=concurrent)
 
     def fetch_albums_by_artist(self, artist_id):
         """
         Fetch all albums for a given artist.
         """
-        url = f'https://api.spotify.com/v1/artists/{artist_id}/albums'
-        return self._make_request(url)['items']
+        return list(self.iter_albums_by_artist(artist_id))
 
     def fetch_tracks_by_album(self, album_id):
         """
         Fetch all tracks for a given album.
         """
-        url = f'https://api.spotify.com/v1/albums/{album_id}/tracks'
-        return self._make_request(url)['items']
+        return list(self.iter_tracks_by_album(album_id))
 
     @staticmethod
     def store_artist_data(db_connector, artist_data):
@@ -138,21 +352,35 @@ class SpotifyAPI:
         ))
         db_connector.connection.commit()
 
+    @staticmethod
+    def store_artists_data(db_connector, artists_data):
+        """
+        Store follower data for many artists with a single multi-row insert.
+        """
+        rows = [
+            {
+                "artist_id": artist_data['artist_id'],
+                "artist_name": artist_data['artist_name'],
+                "followers": artist_data['followers'],
+                "timestamp": artist_data['timestamp']
+            }
+            for artist_data in artists_data
+        ]
+        db_connector.insert_many("spotify_followers", rows)
+
     def fetch_and_store_songs_by_artist(self, db_connector, artist_spotify_id):
         """
         Fetch and store all songs for a given artist.
         """
         try:
-            albums = self.fetch_albums_by_artist(artist_spotify_id)
-            print(f"Found {len(albums)} albums for artist {artist_spotify_id}.")
-
-            for album in albums:
+            album_count = 0
+            for album in self.iter_albums_by_artist(artist_spotify_id):
+                album_count += 1
                 album_id = album['id']
                 album_name = album['name']
-                tracks = self.fetch_tracks_by_album(album_id)
-                print(f"Found {len(tracks)} tracks in album '{album_name}'. Adding to database...")
+                print(f"Adding tracks from album '{album_name}' to database...")
 
-                for track in tracks:
+                for track in self.iter_tracks_by_album(album_id):
                     track_name = track['name']
                     spotify_track_id = track['id']
 
@@ -167,6 +395,8 @@ class SpotifyAPI:
                     new_song.save_to_db(db_connector)
                     print(f"Added track '{track_name}' to the database.")
 
+            print(f"Found {album_count} albums for artist {artist_spotify_id}.")
+
         except Exception as e:
             print(f"Error fetching and adding songs: {e}")
 
@@ -184,7 +414,8 @@ class SpotifyAPI:
             headers = {
                 "Authorization": f"Bearer {self.token}"
             }
-            response = requests.get(url, headers=headers)
+            self.rate_limiter.acquire()
+            response = self.session.get(url, headers=headers)
 
             if response.status_code == 200:
                 playlist_data = response.json()
@@ -195,7 +426,7 @@ class SpotifyAPI:
                 }
             elif response.status_code == 401:  # Unauthorized
                 print("Token expired or invalid. Refreshing token...")
-                self.token = _get_access_token()  # Refresh the token
+                self._check_token_expiry(force=True)  # Refresh the token
                 return self.fetch_playlist_data(playlist_id)  # Retry the request
             elif response.status_code == 404:  # Not Found
                 print(f"Error: Playlist with ID '{playlist_id}' not found.")
@@ -219,13 +450,24 @@ class SpotifyAPI:
         except Exception as e:
             print(f"Error fetching/storing artist data: {e}")
 
+    def fetch_and_store_artists_data(self, db_connector, artist_ids):
+        """
+        Fetch and store follower data for many artists using the batched artists endpoint.
+        Returns a dictionary keyed by artist ID with the data that was stored.
+        """
+        artists_data = self.fetch_artists_data(artist_ids)
+        self.store_artists_data(db_connector, artists_data.values())
+        return artists_data
+
 
 def fetch_and_store_songs_by_artist(db_connector, artist_spotify_id):
     """
     Fetch and store all songs for a given artist.
     """
     spotify_api = SpotifyAPI()
-
-    spotify_api.fetch_and_store_songs_by_artist(db_connector, artist_spotify_id)
+    try:
+        spotify_api.fetch_and_store_songs_by_artist(db_connector, artist_spotify_id)
+    finally:
+        spotify_api.close()
 
 
@@ -2,81 +2,187 @@
 import logging
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from src.database.countview_latest import CountviewLatest
+from src.models.song import Song
 
 logger = logging.getLogger(__name__)
 
 
 class YouTubeAPI:
+    MAX_IDS_PER_REQUEST = 50  # videos.list accepts up to 50 comma-separated IDs
+    SONG_BATCH_SIZE = 500  # Songs read and written per round by update_all_views
+    COUNTVIEW_UPDATE_COLUMNS = ["countview", "song_name", "album_name", "album_id"]
+
     def __init__(self, api_key, db):
         self.api_key = api_key
         self.youtube = build("youtube", "v3", developerKey=self.api_key)
         self.db = db
 
+    def close(self):
+        """Release the HTTP connection of the discovery client."""
+        self.youtube.close()
+
+    @staticmethod
+    def _is_valid_video_id(video_id):
+        return bool(video_id) and len(video_id) == 11
+
     def get_video_views(self, video_id):
-        if not video_id or len(video_id) != 11:
+        if not self._is_valid_video_id(video_id):
             logger.warning(f"Invalid video ID: {video_id}")
             return 0
 
-        try:
-            request = self.youtube.videos().list(part="statistics", id=video_id)
-            response = request.execute()
-            if response['items']:
-                return int(response['items'][0]['statistics']['viewCount'])
-            return 0
-        except HttpError as e:
-            logger.error(f"Failed to fetch views for video {video_id}: {e}")
-            return 0
+        return self.get_videos_views([video_id]).get(video_id, 0)
+
+    def get_videos_views(self, video_ids):
+        """
+        Fetch view counts for many videos, 50 IDs per videos.list call.
+        Returns a dict of video ID -> views; invalid, unknown and failed IDs are left out.
+        """
+        unique_ids = []
+        for video_id in dict.fromkeys(video_ids):
+            if self._is_valid_video_id(video_id):
+                unique_ids.append(video_id)
+            else:
+                logger.warning(f"Invalid video ID: {video_id}")
+
+        views = {}
+        for i in range(0, len(unique_ids), self.MAX_IDS_PER_REQUEST):
+            chunk = unique_ids[i:i + self.MAX_IDS_PER_REQUEST]
+            try:
+                request = self.youtube.videos().list(
+                    part="statistics", id=",".join(chunk), maxResults=self.MAX_IDS_PER_REQUEST
+                )
+                response = request.execute()
+            except HttpError as e:
+                logger.error(f"Failed to fetch views for videos {chunk}: {e}")
+                continue
+
+            for item in response.get('items', []):
+                view_count = item.get('statistics', {}).get('viewCount')
+                if view_count is not None:
+                    views[item['id']] = int(view_count)
+        return views
 
     def update_all_youtube_views(self):
         try:
             if not self.db.is_connected():
                 self.db.connect()
 
-            songs = self.db.fetch_all(
-                "SELECT song_id, youtube_id, main_artist_id FROM songs WHERE youtube_id IS NOT NULL AND youtube_id != ''"
+            batches = self.db.stream(
+                "SELECT song_id, youtube_id, main_artist_id FROM songs WHERE youtube_id IS NOT NULL AND youtube_id != ''",
+                batch_size=self.MAX_IDS_PER_REQUEST,
+                batches=True
             )
-            if not songs:
-                logger.warning("No songs found with valid YouTube IDs.")
-                return
+            song_details = Song.get_countview_details(self.db)
+            song_count = 0
+            for songs in batches:
+                song_count += len(songs)
+                views_by_id = self.get_videos_views(song['youtube_id'] for song in songs)
 
-            for song in songs:
-                song_id = song['song_id']
-                youtube_id = song['youtube_id']
-                artist_id = song['main_artist_id']
+                for song in songs:
+                    song_id = song['song_id']
+                    youtube_id = song['youtube_id']
+                    artist_id = song['main_artist_id']
 
-                try:
-                    if not youtube_id or len(youtube_id) != 11:
-                        logger.warning(f"Invalid video ID for song {song_id}: {youtube_id}")
+                    try:
+                        views = views_by_id.get(youtube_id, 0)
+                        if views > 0:
+                            self._save_youtube_views(song_id, artist_id, views, song_details.get(song_id, {}))
+                            logger.info(f"Updated YouTube views for song ID {song_id}: {views} views")
+                    except Exception as e:
+                        logger.error(f"Error processing song ID {song_id}: {e}")
                         continue
 
-                    views = self.get_video_views(youtube_id)
-                    if views > 0:
-                        self._save_youtube_views(song_id, artist_id, views)
-                        logger.info(f"Updated YouTube views for song ID {song_id}: {views} views")
-                except Exception as e:
-                    logger.error(f"Error processing song ID {song_id}: {e}")
-                    continue
+            if not song_count:
+                logger.warning("No songs found with valid YouTube IDs.")
 
         except Exception as e:
             logger.error(f"Error updating YouTube views: {e}")
             raise
 
-    def _save_youtube_views(self, song_id, artist_id, views):
+    def _iter_song_batches(self, song_ids=None):
+        """
+        Yield lists of up to SONG_BATCH_SIZE songs with a YouTube or YouTube Music ID, streamed
+        from the database. With song_ids, only those songs are read, SONG_BATCH_SIZE IDs per query.
+        """
+        query = """
+            SELECT s.song_id, s.youtube_id, s.ytmsc_id, s.main_artist_id,
+                   s.name AS song_name, a.name AS album_name, s.album_id
+            FROM songs s
+            LEFT JOIN albums a ON s.album_id = a.album_id
+            WHERE ((s.youtube_id IS NOT NULL AND s.youtube_id != '')
+                OR (s.ytmsc_id IS NOT NULL AND s.ytmsc_id != ''))
+        """
+        if song_ids is None:
+            yield from self.db.stream(query, batch_size=self.SONG_BATCH_SIZE, batches=True)
+            return
+
+        song_ids = list(dict.fromkeys(song_ids))
+        for start in range(0, len(song_ids), self.SONG_BATCH_SIZE):
+            chunk = song_ids[start:start + self.SONG_BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            yield from self.db.stream(f"{query} AND s.song_id IN ({placeholders})", tuple(chunk),
+                                      batch_size=self.SONG_BATCH_SIZE, batches=True)
+
+    def update_all_views(self, song_ids=None):
+        """
+        Refresh YouTube and YouTube Music views in a single pass.
+        Songs are streamed in batches; every distinct video ID of a batch across songs.youtube_id
+        and songs.ytmsc_id is fetched once and the results are written to both countview tables
+        with bulk upserts.
+
+        Args:
+            song_ids (iterable): Only refresh these songs, e.g. as picked by RefreshScheduler.
+        """
+        try:
+            song_count = 0
+            saved = {'youtube_song_countview': 0, 'youtubemsc_song_countview': 0}
+            for songs in self._iter_song_batches(song_ids):
+                song_count += len(songs)
+                video_ids = {song[column] for song in songs for column in ('youtube_id', 'ytmsc_id') if song[column]}
+                views_by_id = self.get_videos_views(video_ids)
+                logger.info(f"Fetched views for {len(views_by_id)} of {len(video_ids)} distinct videos.")
+
+                with self.db.checkout() as connection:
+                    for column, table in (('youtube_id', 'youtube_song_countview'),
+                                          ('ytmsc_id', 'youtubemsc_song_countview')):
+                        rows = []
+                        for song in songs:
+                            views = views_by_id.get(song[column], 0)
+                            if views > 0:
+                                rows.append({
+                                    "song_id": song['song_id'],
+                                    "artist_id": song['main_artist_id'],
+                                    "countview": views,
+                                    "song_name": song['song_name'],
+                                    "album_name": song['album_name'],
+                                    "album_id": song['album_id'],
+                                })
+                        CountviewLatest.upsert(self.db, table, rows, connection)
+                        self.db.upsert_many(table, rows, update_columns=self.COUNTVIEW_UPDATE_COLUMNS,
+                                            commit=False, connection=connection)
+                        saved[table] += len(rows)
+                    connection.commit()
+
+            if not song_count:
+                logger.warning("No songs found with valid YouTube or YouTube Music IDs.")
+                return
+            for table, count in saved.items():
+                logger.info(f"Saved views for {count} songs to {table}.")
+
+        except Exception as e:
+            logger.error(f"Error updating YouTube and YouTube Music views: {e}")
+            raise
+
+    def _save_youtube_views(self, song_id, artist_id, views, song_info=None):
         cursor = None
         try:
             cursor = self.db.connection.cursor()
-            # First get song and album info
-            cursor.execute("""
-                SELECT s.name, a.name, s.album_id 
-                FROM songs s
-                LEFT JOIN albums a ON s.album_id = a.album_id
-                WHERE s.song_id = %s
-            """, (song_id,))
-            song_info = cursor.fetchone()
-
-            song_name = song_info[0] if song_info else None
-            album_name = song_info[1] if song_info else None
-            album_id = song_info[2] if song_info else None
+            if song_info is None:
+                song_info = Song.get_countview_details(self.db, [song_id]).get(song_id, {})
+            song_name = song_info.get("song_name")
+            album_name = song_info.get("album_name")
+            album_id = song_info.get("album_id")
 
             query = """
                 INSERT INTO youtube_song_countview 
@@ -88,6 +194,10 @@ class YouTubeAPI:
                     album_name = VALUES(album_name),
                     album_id = VALUES(album_id)
             """
+            CountviewLatest.upsert(self.db, "youtube_song_countview", [{
+                "song_id": song_id, "artist_id": artist_id, "countview": views,
+                "song_name": song_name, "album_name": album_name, "album_id": album_id,
+            }], self.db.connection)
             cursor.execute(query, (song_id, artist_id, views, song_name, album_name, album_id))
             self.db.connection.commit()
             logger.info(f"Saved YouTube views for song ID {song_id}.")
@@ -2,6 +2,8 @@
 import logging
 from googleapiclient.errors import HttpError
 from src.apis.youtube_api import YouTubeAPI
+from src.database.countview_latest import CountviewLatest
+from src.models.song import Song
 
 logger = logging.getLogger(__name__)
 
@@ -11,51 +13,47 @@ class YouTubeMusicAPI(YouTubeAPI):
             if not self.db.is_connected():
                 self.db.connect()
 
-            songs = self.db.fetch_all(
-                "SELECT song_id, ytmsc_id, main_artist_id FROM songs WHERE ytmsc_id IS NOT NULL AND ytmsc_id != ''"
+            batches = self.db.stream(
+                "SELECT song_id, ytmsc_id, main_artist_id FROM songs WHERE ytmsc_id IS NOT NULL AND ytmsc_id != ''",
+                batch_size=self.MAX_IDS_PER_REQUEST,
+                batches=True
             )
-            if not songs:
-                logger.warning("No songs found with valid YouTube Music IDs.")
-                return
+            song_details = Song.get_countview_details(self.db)
+            song_count = 0
+            for songs in batches:
+                song_count += len(songs)
+                views_by_id = self.get_videos_views(song['ytmsc_id'] for song in songs)
 
-            for song in songs:
-                song_id = song['song_id']
-                ytmsc_id = song['ytmsc_id']
-                artist_id = song['main_artist_id']
+                for song in songs:
+                    song_id = song['song_id']
+                    ytmsc_id = song['ytmsc_id']
+                    artist_id = song['main_artist_id']
 
-                try:
-                    if not ytmsc_id or len(ytmsc_id) != 11:
-                        logger.warning(f"Invalid video ID for song {song_id}: {ytmsc_id}")
+                    try:
+                        views = views_by_id.get(ytmsc_id, 0)
+                        if views > 0:
+                            self.save_youtubemsc_views_to_db(song_id, artist_id, views, song_details.get(song_id, {}))
+                            logger.info(f"Updated YouTube Music views for song ID {song_id}: {views} views")
+                    except Exception as e:
+                        logger.error(f"Error processing song ID {song_id}: {e}")
                         continue
 
-                    views = self.get_video_views(ytmsc_id)
-                    if views > 0:
-                        self.save_youtubemsc_views_to_db(song_id, artist_id, views)
-                        logger.info(f"Updated YouTube Music views for song ID {song_id}: {views} views")
-                except Exception as e:
-                    logger.error(f"Error processing song ID {song_id}: {e}")
-                    continue
+            if not song_count:
+                logger.warning("No songs found with valid YouTube Music IDs.")
 
         except Exception as e:
             logger.error(f"Error updating YouTube Music views: {e}")
             raise
 
-    def save_youtubemsc_views_to_db(self, song_id, artist_id, views):
+    def save_youtubemsc_views_to_db(self, song_id, artist_id, views, song_info=None):
         cursor = None
         try:
             cursor = self.db.connection.cursor()
-            # First get song and album info
-            cursor.execute("""
-                SELECT s.name, a.name, s.album_id 
-                FROM songs s
-                LEFT JOIN albums a ON s.album_id = a.album_id
-                WHERE s.song_id = %s
-            """, (song_id,))
-            song_info = cursor.fetchone()
-
-            song_name = song_info[0] if song_info else None
-            album_name = song_info[1] if song_info else None
-            album_id = song_info[2] if song_info else None
+            if song_info is None:
+                song_info = Song.get_countview_details(self.db, [song_id]).get(song_id, {})
+            song_name = song_info.get("song_name")
+            album_name = song_info.get("album_name")
+            album_id = song_info.get("album_id")
 
             query = """
                 INSERT INTO youtubemsc_song_countview 
@@ -67,6 +65,10 @@ class YouTubeMusicAPI(YouTubeAPI):
                     album_name = VALUES(album_name),
                     album_id = VALUES(album_id)
             """
+            CountviewLatest.upsert(self.db, "youtubemsc_song_countview", [{
+                "song_id": song_id, "artist_id": artist_id, "countview": views,
+                "song_name": song_name, "album_name": album_name, "album_id": album_id,
+            }], self.db.connection)
             cursor.execute(query, (song_id, artist_id, views, song_name, album_name, album_id))
             self.db.connection.commit()
             logger.info(f"Saved YouTube Music views for song ID {song_id}.")
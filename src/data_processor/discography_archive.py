@@ -0,0 +1,264 @@
+import logging
+import os
+import re
+from datetime import datetime
+from itertools import islice
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.data_processor.discography_files import is_discography_file, iter_discography
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.path.join("data", "archive")
+
+# One row per track; albums without tracks get a single row with empty track columns.
+# artist_spotify_id and capture_date are the partition columns and are stored in the directory names.
+ARCHIVE_SCHEMA = pa.schema([
+    ("artist_spotify_id", pa.string()),
+    ("capture_date", pa.string()),
+    ("artist_name", pa.string()),
+    ("captured_at", pa.string()),
+    ("source_file", pa.string()),
+    ("album_position", pa.int32()),
+    ("album_spotify_id", pa.string()),
+    ("album_name", pa.string()),
+    ("album_type", pa.string()),
+    ("album_release_date", pa.string()),
+    ("album_total_tracks", pa.int32()),
+    ("album_spotify_url", pa.string()),
+    ("track_position", pa.int32()),
+    ("song_spotify_id", pa.string()),
+    ("song_name", pa.string()),
+    ("song_spotify_url", pa.string()),
+    ("track_number", pa.int32()),
+    ("disc_number", pa.int32()),
+    ("duration_ms", pa.int64()),
+    ("explicit", pa.bool_()),
+])
+PARTITION_COLUMNS = ["artist_spotify_id", "capture_date"]
+
+
+def _output_pattern(filename):
+    """Match the Parquet files archive_file writes for the raw file named filename."""
+    return re.compile(re.escape(filename) + r"-\d{5}-\d+\.parquet")
+
+
+def _remove_archived_output(archive_dir, artist_spotify_id, filename):
+    """
+    Delete what an earlier archive_file run wrote for filename in any capture date of the
+    artist, and drop capture date directories left empty.
+    """
+    pattern = _output_pattern(filename)
+    artist_dir = os.path.join(archive_dir, f"artist_spotify_id={artist_spotify_id}")
+    for capture_dir in _partition_values(artist_dir, "capture_date").values():
+        for entry in os.listdir(capture_dir):
+            if pattern.fullmatch(entry):
+                os.remove(os.path.join(capture_dir, entry))
+        if not os.listdir(capture_dir):
+            os.rmdir(capture_dir)
+
+
+def _capture_date(artist_info, file_path):
+    """Return the YYYY-MM-DD a dump was captured, from its artist timestamp or the file mtime."""
+    try:
+        return datetime.fromisoformat(str(artist_info.get("timestamp"))).date().isoformat()
+    except ValueError:
+        return datetime.fromtimestamp(os.path.getmtime(file_path)).date().isoformat()
+
+
+def _album_rows(artist_columns, album_position, album_info):
+    album_columns = {
+        **artist_columns,
+        "album_position": album_position,
+        "album_spotify_id": album_info.get("id"),
+        "album_name": album_info.get("name"),
+        "album_type": album_info.get("album_type"),
+        "album_release_date": album_info.get("release_date"),
+        "album_total_tracks": album_info.get("total_tracks"),
+        "album_spotify_url": album_info.get("external_urls", {}).get("spotify"),
+    }
+    tracks = album_info.get("tracks", [])
+    if not tracks:
+        return [album_columns]
+    return [
+        {
+            **album_columns,
+            "track_position": track_position,
+            "song_spotify_id": song_info.get("id"),
+            "song_name": song_info.get("name"),
+            "song_spotify_url": song_info.get("external_urls", {}).get("spotify"),
+            "track_number": song_info.get("track_number"),
+            "disc_number": song_info.get("disc_number"),
+            "duration_ms": song_info.get("duration_ms"),
+            "explicit": song_info.get("explicit"),
+        }
+        for track_position, song_info in enumerate(tracks)
+    ]
+
+
+def archive_file(file_path, archive_dir=ARCHIVE_DIR, album_batch_size=200):
+    """
+    Append one raw discography file to the Parquet archive.
+
+    The archive is a Parquet dataset partitioned as
+    archive_dir/artist_spotify_id=<id>/capture_date=<YYYY-MM-DD>/, with one row per track.
+    The file is streamed in album batches; every batch becomes one Parquet file named after
+    the full source file name. Output of an earlier run for the same file is deleted first,
+    whatever capture date it landed in, so archiving a file again replaces it.
+
+    Returns:
+        int: Number of rows written, or None if the file has no artist Spotify ID.
+    """
+    records = iter_discography(file_path)
+    kind, artist_info = next(records, (None, None))
+    if kind != "artist" or not artist_info.get("artist_id"):
+        logger.warning(f"Not archiving {file_path}: missing artist Spotify ID.")
+        return None
+
+    filename = os.path.basename(file_path)
+    artist_columns = {
+        "artist_spotify_id": artist_info["artist_id"],
+        "capture_date": _capture_date(artist_info, file_path),
+        "artist_name": artist_info.get("name"),
+        "captured_at": str(artist_info.get("timestamp")) if artist_info.get("timestamp") else None,
+        "source_file": filename,
+    }
+    _remove_archived_output(archive_dir, artist_info["artist_id"], filename)
+
+    albums = enumerate(record for kind, record in records if kind == "album")
+    written = 0
+    batch_number = 0
+    while True:
+        batch = list(islice(albums, album_batch_size))
+        if not batch and batch_number > 0:
+            break
+        rows = [row for position, album_info in batch for row in _album_rows(artist_columns, position, album_info)]
+        if not rows:
+            # Keep artists without albums in the archive
+            rows = [dict(artist_columns)]
+        pq.write_to_dataset(
+            pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA),
+            root_path=archive_dir,
+            partition_cols=PARTITION_COLUMNS,
+            basename_template=f"{filename}-{batch_number:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            compression="zstd",
+        )
+        written += len(rows)
+        batch_number += 1
+    logger.info(f"Archived {file_path}: {written} rows.")
+    return written
+
+
+def archive_directory(raw_data_dir, archive_dir=ARCHIVE_DIR, remove_source=False):
+    """
+    Archive every raw discography file in a directory.
+
+    Args:
+        raw_data_dir (str): Directory holding the raw files.
+        archive_dir (str): Root of the Parquet dataset.
+        remove_source (bool): Delete each raw file once it is archived.
+
+    Returns:
+        dict: Number of files archived, skipped and failed.
+    """
+    summary = {"archived": 0, "skipped": 0, "failed": 0}
+    for filename in sorted(os.listdir(raw_data_dir)):
+        if not is_discography_file(filename):
+            continue
+        file_path = os.path.join(raw_data_dir, filename)
+        try:
+            if archive_file(file_path, archive_dir) is None:
+                summary["skipped"] += 1
+                continue
+        except Exception as e:
+            logger.error(f"Error archiving {file_path}: {e}")
+            summary["failed"] += 1
+            continue
+        summary["archived"] += 1
+        if remove_source:
+            os.remove(file_path)
+    return summary
+
+
+def _partition_values(directory, key):
+    """Return {value: path} for the key=value subdirectories of a Hive-partitioned directory."""
+    prefix = f"{key}="
+    if not os.path.isdir(directory):
+        return {}
+    return {
+        entry[len(prefix):]: os.path.join(directory, entry)
+        for entry in sorted(os.listdir(directory))
+        if entry.startswith(prefix) and os.path.isdir(os.path.join(directory, entry))
+    }
+
+
+def iter_archived_discographies(archive_dir=ARCHIVE_DIR, artist_ids=None, since=None, until=None):
+    """
+    Yield archived discographies in the format returned by SpotifyAPI.fetch_all_artist_info.
+
+    Only the partitions of the requested artists and capture dates are read, one capture
+    date at a time.
+
+    Args:
+        archive_dir (str): Root of the Parquet dataset.
+        artist_ids (list): Artist Spotify IDs to read. Defaults to every artist.
+        since (str): First capture date to read, as YYYY-MM-DD.
+        until (str): Last capture date to read, as YYYY-MM-DD.
+
+    Yields:
+        dict: Discography with 'artist' and 'albums' keys, one per archived source file.
+    """
+    artist_partitions = _partition_values(archive_dir, "artist_spotify_id")
+    for artist_spotify_id in artist_ids if artist_ids is not None else artist_partitions:
+        artist_dir = artist_partitions.get(artist_spotify_id)
+        if artist_dir is None:
+            continue
+        for capture_date, capture_dir in _partition_values(artist_dir, "capture_date").items():
+            if (since and capture_date < since) or (until and capture_date > until):
+                continue
+            rows = pq.read_table(capture_dir).to_pylist()
+            yield from _discographies_from_rows(artist_spotify_id, rows)
+
+
+def _discographies_from_rows(artist_spotify_id, rows):
+    by_source = {}
+    for row in rows:
+        by_source.setdefault(row["source_file"], []).append(row)
+
+    for source_file, source_rows in sorted(by_source.items()):
+        source_rows.sort(key=lambda row: (row["album_position"] is None, row["album_position"] or 0,
+                                          row["track_position"] or 0))
+        first = source_rows[0]
+        albums = {}
+        for row in source_rows:
+            if row["album_spotify_id"] is None:
+                continue
+            album = albums.setdefault(row["album_position"], {
+                "id": row["album_spotify_id"],
+                "name": row["album_name"],
+                "album_type": row["album_type"],
+                "release_date": row["album_release_date"],
+                "total_tracks": row["album_total_tracks"],
+                "external_urls": {"spotify": row["album_spotify_url"]},
+                "tracks": [],
+            })
+            if row["song_spotify_id"] is not None:
+                album["tracks"].append({
+                    "id": row["song_spotify_id"],
+                    "name": row["song_name"],
+                    "external_urls": {"spotify": row["song_spotify_url"]},
+                    "track_number": row["track_number"],
+                    "disc_number": row["disc_number"],
+                    "duration_ms": row["duration_ms"],
+                    "explicit": row["explicit"],
+                })
+        yield {
+            "artist": {
+                "artist_id": artist_spotify_id,
+                "name": first["artist_name"],
+                "timestamp": first["captured_at"],
+            },
+            "albums": list(albums.values()),
+            "source_file": source_file,
+        }
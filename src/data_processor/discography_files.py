@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import ijson
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Compression name -> file suffix of the compact format
+COMPRESSION_SUFFIXES = {
+    None: ".jsonl",
+    "gzip": ".jsonl.gz",
+    "zstd": ".jsonl.zst",
+}
+# Every suffix the readers accept; ".json" is the legacy single-document format
+RAW_FILE_SUFFIXES = tuple(COMPRESSION_SUFFIXES.values()) + (".json",)
+
+
+def is_discography_file(filename):
+    """Return True if filename has one of the raw discography file suffixes."""
+    return filename.endswith(RAW_FILE_SUFFIXES)
+
+
+def is_compressed(filename):
+    """Return True if filename is a gzip or zstd compressed discography file."""
+    return filename.endswith((".gz", ".zst"))
+
+
+def _open_binary(path, mode):
+    """
+    Open a discography file as bytes, compressing or decompressing based on its suffix.
+
+    Args:
+        path (str): File path.
+        mode (str): 'r' or 'w'.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "b")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Reading or writing {path} requires the 'zstandard' package.")
+        raw_file = open(path, mode + "b")
+        if mode == "w":
+            return zstandard.ZstdCompressor().stream_writer(raw_file, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw_file, closefd=True)
+    return open(path, mode + "b")
+
+
+def _open_text(path, mode):
+    """
+    Open a discography file as UTF-8 text, compressing or decompressing based on its suffix.
+
+    Args:
+        path (str): File path.
+        mode (str): 'r' or 'w'.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return io.TextIOWrapper(_open_binary(path, mode), encoding="utf-8")
+
+
+def write_discography(artist_info, directory, basename, compression="gzip"):
+    """
+    Write a discography returned by SpotifyAPI.fetch_all_artist_info in the compact format.
+
+    The file is JSON Lines: one {"artist": ...} line followed by one {"album": ...} line per
+    album, each album carrying its own tracks. The top-level "tracks" list is not written
+    since it repeats the album tracks.
+
+    Args:
+        artist_info (dict): Discography with 'artist' and 'albums' keys.
+        directory (str): Directory to write to. Created if missing.
+        basename (str): File name without suffix.
+        compression (str): 'gzip', 'zstd' or None.
+
+    Returns:
+        str: Path of the written file.
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression {compression!r}; use one of {list(COMPRESSION_SUFFIXES)}.")
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, basename + COMPRESSION_SUFFIXES[compression])
+    with _open_text(file_path, "w") as output:
+        output.write(json.dumps({"artist": artist_info.get("artist", {})},
+                                separators=(",", ":"), default=str) + "\n")
+        for album_info in artist_info.get("albums", []):
+            output.write(json.dumps({"album": album_info}, separators=(",", ":"), default=str) + "\n")
+    return file_path
+
+
+def iter_discography(file_path):
+    """
+    Yield the artist and then the albums of a discography file, one at a time.
+
+    Compact files are parsed line by line and legacy '.json' files incrementally, so memory
+    use does not depend on the size of the discography.
+
+    Yields:
+        tuple: ('artist', artist dict) once, then ('album', album dict) per album.
+    """
+    if file_path.endswith(".json"):
+        # Two passes over the legacy document: the artist object, then the albums one by one.
+        # The top-level "tracks" list repeats the album tracks and is never built.
+        with open(file_path, "rb") as json_file:
+            yield "artist", next(ijson.items(json_file, "artist", use_float=True), {})
+        with open(file_path, "rb") as json_file:
+            for album_info in ijson.items(json_file, "albums.item", use_float=True):
+                yield "album", album_info
+        return
+
+    with _open_text(file_path, "r") as lines:
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "artist" in record:
+                yield "artist", record["artist"]
+            elif "album" in record:
+                yield "album", record["album"]
+            else:
+                logger.warning(f"Ignoring unknown record on line {line_number} of {file_path}.")
+
+
+def decompressed_size(file_path, limit=None, chunk_size=1 << 20):
+    """
+    Return the size of a discography file once decompressed.
+
+    Compressed files are decompressed in chunks to count their bytes. With a limit, counting
+    stops as soon as the size is known to exceed it and some value above the limit is returned.
+    """
+    if not is_compressed(file_path):
+        return os.path.getsize(file_path)
+    size = 0
+    with _open_binary(file_path, "r") as stream:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            size += len(chunk)
+            if limit is not None and size > limit:
+                break
+    return size
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as raw_file:
+        for chunk in iter(lambda: raw_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
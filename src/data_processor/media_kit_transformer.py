@@ -1,22 +1,69 @@
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from src.database.db_connector import DBConnector
+from src.database.countview_latest import CountviewLatest
+from src.database.db_setup import DBSetup
 
 logger = logging.getLogger(__name__)
 
 class MediaKitTransformer:
-    def __init__(self, db: DBConnector):
+    MEDIA_KIT_UPDATE_COLUMNS = [
+        "artist_name", "category", "record_label",
+        "spotify_song_count", "spotify_total_streams",
+        "spotify_monthly_listeners", "spotify_followers",
+        "youtube_views", "youtube_music_views",
+    ]
+
+    # Tables whose new rows make an artist's media kit stale:
+    # table -> (capture time column, query for the artists with rows in a (mark, new mark] window)
+    CHANGE_SOURCES = {
+        "spotify_song_countview_latest": ("scraped_at", """
+            SELECT DISTINCT artist_id FROM spotify_song_countview_latest
+            WHERE scraped_at > %s AND scraped_at <= %s
+        """),
+        "youtube_song_countview_latest": ("scraped_at", """
+            SELECT DISTINCT artist_id FROM youtube_song_countview_latest
+            WHERE scraped_at > %s AND scraped_at <= %s
+        """),
+        "youtubemsc_song_countview_latest": ("scraped_at", """
+            SELECT DISTINCT artist_id FROM youtubemsc_song_countview_latest
+            WHERE scraped_at > %s AND scraped_at <= %s
+        """),
+        "monthly_listeners": ("fetched_at", """
+            SELECT DISTINCT artist_id FROM monthly_listeners
+            WHERE fetched_at > %s AND fetched_at <= %s
+        """),
+        "spotify_followers": ("timestamp", """
+            SELECT DISTINCT a.artist_id
+            FROM spotify_followers sf
+            JOIN artists a ON a.spotify_id = sf.artist_id
+            WHERE sf.timestamp > %s AND sf.timestamp <= %s
+        """),
+    }
+
+    def __init__(self, db: DBConnector, watermark_lag_minutes=15):
+        """
+        Args:
+            db: Database connector.
+            watermark_lag_minutes (int): How far behind the stored high-water mark each run starts
+                looking for changes. Rows are stamped when inserted but only become visible on
+                commit, so a row stamped just before the mark was read can show up afterwards;
+                the overlap catches it as long as its transaction took less than this.
+        """
         self.db = db
+        self.watermark_lag = timedelta(minutes=watermark_lag_minutes)
 
-    def _fetch_artist_data(self):
+    def _fetch_artist_data(self, artist_ids=None):
         """
-        Fetch all artist data from the database.
+        Fetch all artist data from the database, optionally limited to artist_ids.
         """
-        query = """
-            SELECT artist_id, name, category, r_label
+        condition, params = self._in_filter("artist_id", artist_ids)
+        query = f"""
+            SELECT artist_id, name, category, r_label, spotify_id
             FROM artists
+            WHERE {condition}
         """
-        return self.db.fetch_all(query)
+        return self.db.fetch_all(query, params)
 
     def _fetch_spotify_data(self, artist_id):
         """
@@ -139,10 +186,146 @@ class MediaKitTransformer:
         result = self.db.fetch_one(query, (artist_id,))
         return result["song_count"] if result else 0
 
-    def transform_and_load(self):
+    @staticmethod
+    def _in_filter(column, values):
+        """
+        Build an "column IN (...)" condition and its parameters; None matches every row.
+        """
+        if values is None:
+            return "TRUE", ()
+        values = list(values)
+        if not values:
+            return "FALSE", ()
+        return f"{column} IN ({', '.join(['%s'] * len(values))})", tuple(values)
+
+    def _fetch_latest_followers_by_key(self, keys=None):
+        """
+        Fetch the latest follower count for every key in spotify_followers.artist_id
+        (normally the artist's Spotify ID), optionally limited to the given keys.
+        """
+        condition, params = self._in_filter("artist_id", keys)
+        query = f"""
+            SELECT artist_id, followers
+            FROM (
+                SELECT artist_id, followers,
+                       ROW_NUMBER() OVER (PARTITION BY artist_id ORDER BY timestamp DESC) AS capture_rank
+                FROM spotify_followers
+                WHERE {condition}
+            ) ranked
+            WHERE capture_rank = 1
+        """
+        return {str(row["artist_id"]): row["followers"] for row in self.db.fetch_all(query, params)}
+
+    def _fetch_latest_listeners_by_artist(self, artist_ids=None):
+        """
+        Fetch the latest monthly listeners for every artist, optionally limited to artist_ids.
+        """
+        condition, params = self._in_filter("artist_id", artist_ids)
+        query = f"""
+            SELECT artist_id, listeners
+            FROM (
+                SELECT artist_id, listeners,
+                       ROW_NUMBER() OVER (PARTITION BY artist_id ORDER BY fetched_at DESC) AS capture_rank
+                FROM monthly_listeners
+                WHERE {condition}
+            ) ranked
+            WHERE capture_rank = 1
+        """
+        return {row["artist_id"]: row["listeners"] for row in self.db.fetch_all(query, params)}
+
+    def _fetch_latest_countview_totals(self, table, artist_ids=None):
+        """
+        Sum the current countview of each song per artist from the latest snapshot of one countview table.
+        """
+        condition, params = self._in_filter("artist_id", artist_ids)
+        query = f"""
+            SELECT artist_id, SUM(countview) AS total_views
+            FROM {CountviewLatest.table_for(table)}
+            WHERE {condition}
+            GROUP BY artist_id
+        """
+        return {row["artist_id"]: row["total_views"] for row in self.db.fetch_all(query, params)}
+
+    def _fetch_song_counts(self, artist_ids=None):
+        """
+        Count the songs registered for every artist in the songs table.
+        """
+        condition, params = self._in_filter("main_artist_id", artist_ids)
+        query = f"""
+            SELECT main_artist_id, COUNT(*) AS song_count
+            FROM songs
+            WHERE {condition}
+            GROUP BY main_artist_id
+        """
+        return {row["main_artist_id"]: row["song_count"] for row in self.db.fetch_all(query, params)}
+
+    def _load_watermarks(self):
+        """
+        Return the high-water mark of every tracked source table from the last run.
+        """
+        DBSetup(self.db).create_change_tracking_tables()
+        rows = self.db.fetch_all("SELECT source_table, high_water_mark FROM media_kit_watermarks")
+        return {row["source_table"]: row["high_water_mark"] for row in rows}
+
+    def _save_watermarks(self, marks):
+        rows = [
+            {"source_table": table, "high_water_mark": mark}
+            for table, mark in marks.items() if mark is not None
+        ]
+        if rows:
+            self.db.upsert_many("media_kit_watermarks", rows, update_columns=["high_water_mark"])
+
+    def _changed_artist_ids(self, full=False):
+        """
+        Find the artists with new data in any tracked source since the last run.
+
+        Returns:
+            tuple: (artist IDs to recompute, or None for all of them; new high-water marks per table).
+        """
+        marks = self._load_watermarks()
+        new_marks = {}
+        changed = set()
+        recompute_all = full
+        for table, (time_column, changed_query) in self.CHANGE_SOURCES.items():
+            row = self.db.fetch_one(f"SELECT MAX({time_column}) AS high_water_mark FROM {table}")
+            new_marks[table] = row["high_water_mark"] if row else None
+            old_mark = marks.get(table)
+            if recompute_all or new_marks[table] is None:
+                continue
+            if old_mark is None:
+                # Never tracked before, so there is nothing to compare against
+                recompute_all = True
+            else:
+                rows = self.db.fetch_all(changed_query, (old_mark - self.watermark_lag, new_marks[table]))
+                changed.update(row["artist_id"] for row in rows)
+
+        if recompute_all:
+            return None, new_marks
+
+        # Artists that have never been written to media_kit_data
+        rows = self.db.fetch_all("""
+            SELECT a.artist_id
+            FROM artists a
+            LEFT JOIN media_kit_data m ON m.artist_id = a.artist_id
+            WHERE m.artist_id IS NULL
+        """)
+        changed.update(row["artist_id"] for row in rows)
+        return changed, new_marks
+
+    def transform_and_load(self, set_based=True, full=False):
         """
         Transform data from various tables and load it into media_kit_data.
+
+        Args:
+            set_based (bool): Compute metrics with one query per metric and write them with
+                a single bulk upsert. False runs the original per-artist queries for every artist.
+            full (bool): Recompute every artist. By default the set-based mode only recomputes
+                artists whose songs, listeners or followers got new rows since the last run.
         """
+        if set_based:
+            self._transform_and_load_set_based(full)
+            return
+
         artists = self._fetch_artist_data()
         for artist in artists:
             artist_id = artist["artist_id"]
@@ -170,6 +353,54 @@ class MediaKitTransformer:
             # Insert or update media_kit_data
             self._update_media_kit_data(media_kit_data)
 
+    def _transform_and_load_set_based(self, full=False):
+        """
+        Build media_kit_data in a handful of queries, for every artist or only the changed ones.
+        Song totals are summed from the *_latest snapshot tables.
+        """
+        CountviewLatest.ensure_built(self.db)
+        artist_ids, new_marks = self._changed_artist_ids(full)
+        if artist_ids is not None and not artist_ids:
+            logger.info("No new data since the last media kit run; nothing to recompute.")
+            return
+
+        artists = self._fetch_artist_data(artist_ids)
+        follower_keys = None
+        if artist_ids is not None:
+            follower_keys = {str(artist["spotify_id"]) for artist in artists if artist.get("spotify_id")}
+            follower_keys |= {str(artist["artist_id"]) for artist in artists}
+        followers = self._fetch_latest_followers_by_key(follower_keys)
+        listeners = self._fetch_latest_listeners_by_artist(artist_ids)
+        youtube_views = self._fetch_latest_countview_totals("youtube_song_countview", artist_ids)
+        youtube_music_views = self._fetch_latest_countview_totals("youtubemsc_song_countview", artist_ids)
+        spotify_streams = self._fetch_latest_countview_totals("spotify_song_countview", artist_ids)
+        song_counts = self._fetch_song_counts(artist_ids)
+
+        rows = []
+        for artist in artists:
+            artist_id = artist["artist_id"]
+            artist_followers = followers.get(str(artist.get("spotify_id")))
+            if artist_followers is None:
+                # Fallback: rows keyed by our own artist_id instead of the Spotify ID
+                artist_followers = followers.get(str(artist_id))
+
+            rows.append({
+                "artist_id": artist_id,
+                "artist_name": artist.get("name"),
+                "category": artist.get("category"),
+                "record_label": artist.get("r_label"),
+                "spotify_song_count": song_counts.get(artist_id, 0),
+                "spotify_total_streams": spotify_streams.get(artist_id) or None,
+                "spotify_monthly_listeners": listeners.get(artist_id),
+                "spotify_followers": artist_followers,
+                "youtube_views": youtube_views.get(artist_id),
+                "youtube_music_views": youtube_music_views.get(artist_id),
+            })
+
+        self.db.upsert_many("media_kit_data", rows, update_columns=self.MEDIA_KIT_UPDATE_COLUMNS)
+        self._save_watermarks(new_marks)
+        logger.info(f"Updated media_kit_data for {len(rows)} artists")
+
     def _update_media_kit_data(self, data):
         """
         Insert or update media_kit_data for an artist.
@@ -0,0 +1,228 @@
+import logging
+from src.database.db_connector import DBConnector
+from src.database.db_setup import DBSetup
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    # Where each refreshable metric is stored and which catalog rows it covers. Sources the job
+    # writes to several tables are read from all of them, using whichever has the newest capture.
+    SOURCES = {
+        "spotify_songs": {
+            "tables": ("spotify_song_countview",), "id": "song_id", "value": "countview", "time": "scraped_at",
+            "catalog": "SELECT song_id AS entity_id FROM songs WHERE spotify_url IS NOT NULL",
+        },
+        "youtube_songs": {
+            "tables": ("youtube_song_countview", "youtubemsc_song_countview"),
+            "id": "song_id", "value": "countview", "time": "scraped_at",
+            "catalog": """
+                SELECT song_id AS entity_id FROM songs
+                WHERE (youtube_id IS NOT NULL AND youtube_id != '')
+                   OR (ytmsc_id IS NOT NULL AND ytmsc_id != '')
+            """,
+        },
+        "monthly_listeners": {
+            "tables": ("monthly_listeners",), "id": "artist_id", "value": "listeners", "time": "fetched_at",
+            "catalog": "SELECT artist_id AS entity_id FROM artists WHERE spotify_id IS NOT NULL",
+        },
+        "spotify_followers": {
+            # spotify_followers.artist_id holds the artist's Spotify ID
+            "tables": ("spotify_followers",), "id": "artist_id", "value": "followers", "time": "timestamp",
+            "catalog": "SELECT spotify_id AS entity_id FROM artists WHERE spotify_id IS NOT NULL",
+        },
+    }
+
+    def __init__(self, db: DBConnector, budget=500, min_staleness_hours=6, growth_weight=1.0,
+                 max_backoff_hours=24 * 7):
+        """
+        Decide which songs and artists are worth refreshing on this run.
+
+        Every entity gets a priority of staleness (hours since its last capture) scaled by how
+        fast its numbers grew between its last two captures, so hot releases come up often and
+        dormant back-catalog rarely. Entities that were never captured come first.
+
+        Every selection is recorded as an attempt. An attempt not followed by a capture counts
+        as failed, and entities whose last attempts failed are left out until a back-off of
+        min_staleness_hours doubled per consecutive failure has passed, so deleted tracks or
+        videos that never return views do not take the budget on every run.
+
+        Args:
+            db: Database connector.
+            budget (int): Maximum number of entities refreshed per source and run.
+            min_staleness_hours (float): Entities captured more recently than this are never picked.
+            growth_weight (float): How much one percent of daily growth adds to the priority.
+            max_backoff_hours (float): Longest wait before an entity that keeps failing is retried.
+        """
+        self.db = db
+        self.budget = budget
+        self.min_staleness_hours = min_staleness_hours
+        self.growth_weight = growth_weight
+        self.max_backoff_hours = max_backoff_hours
+        self._tables_ready = False
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            if not self.db.is_connected():
+                self.db.connect()
+            DBSetup(self.db).create_refresh_tables()
+            self._tables_ready = True
+
+    def _latest_observations(self, source):
+        """
+        Return {entity_id: [(value, age_seconds), ...]} with the last two captures of every entity,
+        newest first. Ages are measured with the database clock.
+        """
+        observations = {}
+        for table in source["tables"]:
+            query = """
+                SELECT item_id, metric_value, TIMESTAMPDIFF(SECOND, captured_at, NOW()) AS age_seconds
+                FROM (
+                    SELECT {id} AS item_id, {value} AS metric_value, {time} AS captured_at,
+                           ROW_NUMBER() OVER (PARTITION BY {id} ORDER BY {time} DESC) AS capture_rank
+                    FROM {table}
+                ) ranked
+                WHERE capture_rank <= 2
+                ORDER BY item_id, capture_rank
+            """.format(table=table, **source)
+            table_observations = {}
+            for row in self.db.stream(query):
+                table_observations.setdefault(row['item_id'], []).append((row['metric_value'], row['age_seconds']))
+            for entity_id, captures in table_observations.items():
+                known = observations.get(entity_id)
+                if known is None or (captures[0][1] or 0) < (known[0][1] or 0):
+                    observations[entity_id] = captures
+        return observations
+
+    def _attempts(self, source_name):
+        """
+        Return {entity_id: (failed_attempts, age_seconds)} for the last recorded attempt of every
+        entity of one source. Entity IDs are strings.
+        """
+        self._ensure_tables()
+        rows = self.db.fetch_all("""
+            SELECT entity_id, failed_attempts, TIMESTAMPDIFF(SECOND, attempted_at, NOW()) AS age_seconds
+            FROM refresh_attempts
+            WHERE source = %s
+        """, (source_name,))
+        return {row['entity_id']: (row['failed_attempts'], row['age_seconds']) for row in rows}
+
+    def _record_attempts(self, source_name, attempts):
+        """
+        Store the attempts of this run.
+
+        Args:
+            source_name (str): One of RefreshScheduler.SOURCES.
+            attempts (list): (entity_id, failed_attempts) tuples, failed_attempts counting the
+                consecutive failures before this attempt.
+        """
+        if not attempts:
+            return
+        self._ensure_tables()
+        attempted_at = self.db.fetch_one("SELECT NOW() AS now")["now"]
+        rows = [
+            {"source": source_name, "entity_id": str(entity_id),
+             "failed_attempts": failed_attempts, "attempted_at": attempted_at}
+            for entity_id, failed_attempts in attempts
+        ]
+        self.db.upsert_many("refresh_attempts", rows, update_columns=["failed_attempts", "attempted_at"])
+
+    @staticmethod
+    def _failed_attempts(captures, attempt):
+        """
+        Count the consecutive failed attempts of an entity, its last attempt included.
+        The last attempt failed if no capture is newer than it.
+        """
+        if attempt is None:
+            return 0
+        failed_attempts, attempt_age = attempt
+        if captures and captures[0][1] is not None and attempt_age is not None and captures[0][1] <= attempt_age:
+            return 0
+        return failed_attempts + 1
+
+    def _backoff_hours(self, failed_attempts):
+        return min(self.min_staleness_hours * 2 ** failed_attempts, self.max_backoff_hours)
+
+    def _priority(self, captures):
+        """
+        Score one entity from its last two captures; None if it was refreshed too recently.
+        """
+        latest_value, latest_age = captures[0]
+        staleness_hours = (latest_age or 0) / 3600
+        if staleness_hours < self.min_staleness_hours:
+            return None
+
+        growth_pct_per_day = 0.0
+        if len(captures) > 1:
+            previous_value, previous_age = captures[1]
+            interval_days = max((previous_age - latest_age) / 86400, 1 / 24)
+            if previous_value and latest_value is not None:
+                growth_pct_per_day = max(latest_value - previous_value, 0) * 100 / previous_value / interval_days
+        return staleness_hours * (1 + self.growth_weight * growth_pct_per_day)
+
+    def rank(self, source_name):
+        """
+        Rank the entities of one source by refresh priority.
+
+        Args:
+            source_name (str): One of RefreshScheduler.SOURCES.
+
+        Returns:
+            list: (entity_id, priority) tuples, highest priority first. Entities that were
+            never captured have an infinite priority; entities backing off from failed
+            attempts are left out.
+        """
+        return [(entity_id, priority) for entity_id, priority, _ in self._rank(source_name)]
+
+    def _rank(self, source_name):
+        """
+        Rank like rank(), also returning the consecutive failed attempts of every entity.
+        Entities still backing off from failed attempts are left out.
+        """
+        source = self.SOURCES[source_name]
+        catalog = [row['entity_id'] for row in self.db.stream(source["catalog"])]
+        observations = self._latest_observations(source)
+        attempts = self._attempts(source_name)
+
+        ranked = []
+        backing_off = 0
+        for entity_id in catalog:
+            captures = observations.get(entity_id)
+            attempt = attempts.get(str(entity_id))
+            failed_attempts = self._failed_attempts(captures, attempt)
+            if failed_attempts and (attempt[1] or 0) / 3600 < self._backoff_hours(failed_attempts):
+                backing_off += 1
+                continue
+            if not captures:
+                ranked.append((entity_id, float("inf"), failed_attempts))
+                continue
+            priority = self._priority(captures)
+            if priority is not None:
+                ranked.append((entity_id, priority, failed_attempts))
+        if backing_off:
+            logger.info(f"Holding back {backing_off} {source_name} entities after failed refreshes.")
+        # Among never-captured entities, the ones that failed least often go first
+        ranked.sort(key=lambda item: (item[1], -item[2]), reverse=True)
+        return ranked
+
+    def select(self, source_name, budget=None):
+        """
+        Return the IDs of the top-priority entities of one source, at most budget of them,
+        and record them as attempted.
+        """
+        budget = self.budget if budget is None else budget
+        ranked = self._rank(source_name)
+        self._record_attempts(source_name, [(entity_id, failed_attempts)
+                                            for entity_id, _, failed_attempts in ranked[:budget]])
+        selected = [entity_id for entity_id, _, _ in ranked[:budget]]
+        logger.info(f"Scheduled {len(selected)} of {len(ranked)} due {source_name} entities for refresh.")
+        return selected
+
+    def plan(self, sources=None, budget=None):
+        """
+        Select the entities to refresh for several sources.
+
+        Returns:
+            dict: Mapping of source name to the list of selected IDs.
+        """
+        return {name: self.select(name, budget) for name in (sources or self.SOURCES)}
@@ -0,0 +1,453 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from src.data_processor.discography_archive import ARCHIVE_DIR, iter_archived_discographies
+from src.data_processor.discography_files import (
+    decompressed_size, file_digest, is_compressed, is_discography_file, iter_discography
+)
+from src.database.db_connector import DBConnector
+from src.database.raw_file_manifest import RawFileManifest
+
+logger = logging.getLogger(__name__)
+
+
+def stage_albums(albums_info):
+    """
+    Flatten albums and their tracks into the rows the loader writes.
+
+    Returns:
+        dict: albums, songs and album_links. albums and songs map Spotify IDs to their JSON
+        entries (first occurrence wins) and album_links lists (album Spotify ID, song Spotify ID).
+    """
+    albums, songs, album_links = {}, {}, []
+    for album_info in albums_info:
+        album_spotify_id = album_info.get("id")
+        if not album_spotify_id:
+            logger.warning("Skipping album: missing Spotify ID.")
+            continue
+        albums.setdefault(album_spotify_id, album_info)
+
+        for song_info in album_info.get("tracks", []):
+            song_spotify_id = song_info.get("id")
+            if not song_spotify_id:
+                logger.warning(f"Skipping song {song_info.get('name')}: missing Spotify ID.")
+                continue
+            # A song keeps the first album it appears on as its album_id
+            songs.setdefault(song_spotify_id, (song_info, album_spotify_id))
+            album_links.append((album_spotify_id, song_spotify_id))
+
+    return {"albums": albums, "songs": songs, "album_links": album_links}
+
+
+def stage_discography(artist_data):
+    """
+    Flatten a discography dict with 'artist' and 'albums' keys into the rows the loader writes.
+
+    Returns:
+        dict: artist_info, artist_spotify_id and the stage_albums() rows, or None if the
+        artist has no Spotify ID.
+    """
+    artist_info = artist_data.get("artist", {})
+    artist_spotify_id = artist_info.get("artist_id")
+    if not artist_spotify_id:
+        return None
+    return {"artist_info": artist_info, "artist_spotify_id": artist_spotify_id,
+            **stage_albums(artist_data.get("albums", []))}
+
+
+def stage_file(file_path, stream_threshold_bytes):
+    """
+    Hash and stage one discography file. Runs in the worker processes of load_directory.
+
+    Files larger than stream_threshold_bytes once decompressed are only hashed; the writer
+    streams them.
+
+    Returns:
+        dict: file_path, size_bytes, mtime, content_hash, streamed and the staged discography
+        (None if the file is streamed or the artist has no Spotify ID).
+    """
+    stat = os.stat(file_path)
+    staged = {
+        "file_path": file_path,
+        "size_bytes": stat.st_size,
+        "mtime": stat.st_mtime,
+        "content_hash": file_digest(file_path),
+        "streamed": decompressed_size(file_path, limit=stream_threshold_bytes) > stream_threshold_bytes,
+        "discography": None,
+    }
+    if not staged["streamed"]:
+        artist_data = {"artist": {}, "albums": []}
+        for kind, record in iter_discography(file_path):
+            if kind == "artist":
+                artist_data["artist"] = record
+            else:
+                artist_data["albums"].append(record)
+        staged["discography"] = stage_discography(artist_data)
+    return staged
+
+
+class SpotifyJsonLoader:
+    # Catalog table -> (Spotify ID column, internal ID column)
+    ID_COLUMNS = {
+        "artists": ("spotify_id", "artist_id"),
+        "albums": ("spotify_album_id", "album_id"),
+        "songs": ("spotify_id", "song_id"),
+    }
+
+    def __init__(self, db: DBConnector, chunk_size=500, album_batch_size=200,
+                 stream_threshold_bytes=16 * 1024 * 1024, max_staged_bytes=128 * 1024 * 1024):
+        """
+        Load the artist discographies saved by SpotifyAPI.fetch_all_artist_info into the catalog.
+
+        Every file is written with a handful of set-based statements: existing IDs are looked up
+        with one query per table, missing rows go in with multi-row inserts, and album and artist
+        links are inserted in bulk. Each file is committed as one transaction.
+
+        Args:
+            db: Database connector.
+            chunk_size (int): Maximum number of rows per INSERT statement and of IDs per lookup.
+            album_batch_size (int): Albums written per round of statements when a file is streamed.
+            stream_threshold_bytes (int): Files larger than this once decompressed are streamed
+                by the writer in album batches instead of being parsed whole by a worker.
+            max_staged_bytes (int): Upper bound on the decompressed size of the files parsed by
+                workers and waiting to be written. A file is always let through on its own.
+        """
+        self.db = db
+        self.chunk_size = chunk_size
+        self.album_batch_size = album_batch_size
+        self.stream_threshold_bytes = stream_threshold_bytes
+        self.max_staged_bytes = max_staged_bytes
+
+    def load(self, artist_data, source="payload"):
+        """
+        Load one discography already parsed into a dict with 'artist' and 'albums' keys.
+
+        Returns:
+            dict: Number of artists, albums, songs and links inserted, or None if the payload was skipped.
+        """
+        discography = stage_discography(artist_data)
+        if discography is None:
+            logger.warning(f"Skipping {source}: missing artist Spotify ID.")
+            return None
+
+        with self.db.checkout() as connection:
+            try:
+                counts = self._write(connection, discography)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        self._log_counts(source, counts)
+        return counts
+
+    def load_directory(self, raw_data_dir, workers=None):
+        """
+        Load every new or changed discography file in a directory.
+
+        Files are read, hashed and parsed by a pool of worker processes while this process
+        writes them one at a time, each in its own transaction together with its manifest entry.
+        Files above stream_threshold_bytes once decompressed are only hashed by the workers and
+        streamed here, and at most max_staged_bytes of parsed files wait to be written.
+        Files whose size and modification time match a loaded or skipped manifest entry are not read at
+        all, and files whose content hash matches are not written again.
+
+        Args:
+            raw_data_dir (str): Directory holding the discography files.
+            workers (int): Number of parsing processes. Defaults to the number of CPUs.
+
+        Returns:
+            dict: Number of files loaded, unchanged, skipped and failed.
+        """
+        manifest = RawFileManifest(self.db)
+        entries = manifest.entries()
+        summary = {"loaded": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+
+        pending_files = deque()
+        for filename in sorted(os.listdir(raw_data_dir)):
+            if not is_discography_file(filename):
+                continue
+            file_path = os.path.join(raw_data_dir, filename)
+            stat = os.stat(file_path)
+            if RawFileManifest.is_unchanged(entries.get(filename), stat.st_size, stat.st_mtime):
+                summary["unchanged"] += 1
+            else:
+                pending_files.append((file_path, self._staged_bytes_bound(file_path, stat.st_size)))
+
+        if not pending_files:
+            logger.info(f"No new files in {raw_data_dir} ({summary['unchanged']} unchanged).")
+            return summary
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded number and size of staged files in flight so memory does not grow
+            # with the backlog or the size of the dumps
+            in_flight = deque()
+            staged_bytes = 0
+            while pending_files or in_flight:
+                while pending_files and len(in_flight) < workers * 2:
+                    file_path, bound = pending_files[0]
+                    if in_flight and staged_bytes + bound > self.max_staged_bytes:
+                        break
+                    pending_files.popleft()
+                    future = executor.submit(stage_file, file_path, self.stream_threshold_bytes)
+                    in_flight.append((file_path, future, bound))
+                    staged_bytes += bound
+
+                file_path, future, bound = in_flight.popleft()
+                self._write_staged_file(manifest, entries, file_path, future, summary)
+                staged_bytes -= bound
+
+        logger.info(f"Processed {raw_data_dir}: {summary['loaded']} loaded, {summary['unchanged']} unchanged, "
+                    f"{summary['skipped']} skipped, {summary['failed']} failed.")
+        return summary
+
+    def _staged_bytes_bound(self, file_path, size_bytes):
+        """
+        Return the most decompressed bytes a worker may parse whole for a file of size_bytes on disk.
+        The decompressed size of a compressed file is only known to its worker.
+        """
+        if is_compressed(file_path):
+            return self.stream_threshold_bytes
+        return size_bytes if size_bytes <= self.stream_threshold_bytes else 0
+
+    def load_archive(self, archive_dir=ARCHIVE_DIR, artist_ids=None, since=None, until=None):
+        """
+        Load discographies from the Parquet archive, optionally limited to some artists and
+        capture dates. See iter_archived_discographies for the arguments.
+
+        Returns:
+            dict: Number of discographies loaded and skipped.
+        """
+        summary = {"loaded": 0, "skipped": 0}
+        for discography in iter_archived_discographies(archive_dir, artist_ids, since, until):
+            source = f"{archive_dir}:{discography['source_file']}"
+            if self.load(discography, source=source) is None:
+                summary["skipped"] += 1
+            else:
+                summary["loaded"] += 1
+        return summary
+
+    def _write_staged_file(self, manifest, entries, file_path, future, summary):
+        """
+        Write the result of one stage_file job and record it in the manifest.
+        """
+        filename = os.path.basename(file_path)
+        try:
+            staged = future.result()
+        except Exception as e:
+            logger.error(f"Error reading {file_path}: {e}")
+            stat = os.stat(file_path)
+            manifest.record(filename, stat.st_size, stat.st_mtime, "", RawFileManifest.FAILED, error=str(e))
+            summary["failed"] += 1
+            return
+
+        entry = entries.get(filename)
+        manifest_row = (filename, staged["size_bytes"], staged["mtime"], staged["content_hash"])
+        if entry is not None and entry['status'] in RawFileManifest.TERMINAL \
+                and entry['content_hash'] == staged["content_hash"]:
+            # Touched but not modified: only refresh the stat fields
+            manifest.record(*manifest_row, entry['status'], error=entry.get('error'))
+            summary["unchanged"] += 1
+            return
+
+        try:
+            with self.db.checkout() as connection:
+                try:
+                    if staged["streamed"]:
+                        counts = self._write_streamed(connection, file_path)
+                    elif staged["discography"] is not None:
+                        counts = self._write(connection, staged["discography"])
+                    else:
+                        counts = None
+                    if counts is not None:
+                        manifest.record(*manifest_row, RawFileManifest.LOADED, connection=connection)
+                        connection.commit()
+                    else:
+                        connection.rollback()
+                except Exception:
+                    connection.rollback()
+                    raise
+        except Exception as e:
+            logger.error(f"Error loading {file_path}: {e}")
+            manifest.record(*manifest_row, RawFileManifest.FAILED, error=str(e))
+            summary["failed"] += 1
+            return
+
+        if counts is None:
+            logger.warning(f"Skipping {file_path}: missing artist Spotify ID.")
+            manifest.record(*manifest_row, RawFileManifest.SKIPPED, error="missing artist Spotify ID")
+            summary["skipped"] += 1
+            return
+
+        self._log_counts(file_path, counts)
+        summary["loaded"] += 1
+
+    @staticmethod
+    def _log_counts(source, counts):
+        logger.info(f"Loaded {source}: {counts['artists']} new artists, {counts['albums']} new albums, "
+                    f"{counts['songs']} new songs, {counts['album_links']} album links, "
+                    f"{counts['artist_links']} artist links.")
+
+    def _chunks(self, values):
+        """Split values into lists of at most chunk_size items."""
+        values = iter(values)
+        return iter(lambda: list(islice(values, self.chunk_size)), [])
+
+    def _id_map(self, connection, table, spotify_ids):
+        """
+        Return {spotify_id: internal id} for the given Spotify IDs, with one query per chunk_size IDs.
+        """
+        spotify_column, id_column = self.ID_COLUMNS[table]
+        id_map = {}
+        cursor = connection.cursor()
+        try:
+            for chunk in self._chunks(spotify_ids):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"""
+                    SELECT {spotify_column}, MIN({id_column})
+                    FROM {table}
+                    WHERE {spotify_column} IN ({placeholders})
+                    GROUP BY {spotify_column}
+                """, chunk)
+                id_map.update(cursor.fetchall())
+            return id_map
+        finally:
+            cursor.close()
+
+    def _insert_missing(self, connection, table, rows_by_spotify_id):
+        """
+        Insert the rows whose Spotify ID is not in the table yet and return the complete ID map.
+
+        IDs are read back with a second lookup because lastrowid only reports the first row
+        of a multi-row insert.
+
+        Args:
+            rows_by_spotify_id (dict): Spotify ID -> row dict to insert if the ID is missing.
+
+        Returns:
+            tuple: ({spotify_id: internal id}, number of inserted rows)
+        """
+        existing = self._id_map(connection, table, rows_by_spotify_id)
+        missing = [rows_by_spotify_id[spotify_id] for spotify_id in rows_by_spotify_id
+                   if spotify_id not in existing]
+        if not missing:
+            return existing, 0
+        self.db.insert_many(table, missing, chunk_size=self.chunk_size, commit=False, connection=connection)
+        return self._id_map(connection, table, rows_by_spotify_id), len(missing)
+
+    def _existing_links(self, connection, table, song_ids):
+        """
+        Return the (owner id, song_id) pairs already stored in a link table for the given songs.
+        """
+        owner_column = "album_id" if table == "album_songs" else "artist_id"
+        links = set()
+        cursor = connection.cursor()
+        try:
+            for chunk in self._chunks(song_ids):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"SELECT {owner_column}, song_id FROM {table} WHERE song_id IN ({placeholders})",
+                               chunk)
+                links.update(cursor.fetchall())
+            return links
+        finally:
+            cursor.close()
+
+    def _write(self, connection, discography):
+        """
+        Write one staged discography on connection without committing.
+        """
+        artist_id, new_artists = self._write_artist(connection, discography["artist_info"],
+                                                    discography["artist_spotify_id"])
+        counts = self._write_albums(connection, artist_id, discography)
+        counts["artists"] = new_artists
+        return counts
+
+    def _write_streamed(self, connection, file_path):
+        """
+        Stream one discography file onto connection in album batches without committing.
+
+        Returns:
+            dict: Insert counts, or None if the file has no artist Spotify ID.
+        """
+        records = iter_discography(file_path)
+        kind, artist_info = next(records, (None, None))
+        if kind != "artist" or not artist_info.get("artist_id"):
+            return None
+        artist_id, new_artists = self._write_artist(connection, artist_info, artist_info["artist_id"])
+
+        counts = {"artists": new_artists, "albums": 0, "songs": 0, "album_links": 0, "artist_links": 0}
+        albums = (record for kind, record in records if kind == "album")
+        while True:
+            batch = list(islice(albums, self.album_batch_size))
+            if not batch:
+                break
+            for key, value in self._write_albums(connection, artist_id, stage_albums(batch)).items():
+                counts[key] += value
+        return counts
+
+    def _write_artist(self, connection, artist_info, artist_spotify_id):
+        """
+        Insert the artist if needed and return (artist_id, number of inserted artists).
+        """
+        artist_ids, new_artists = self._insert_missing(connection, "artists", {
+            artist_spotify_id: {
+                "name": artist_info.get("name"),
+                "spotify_id": artist_spotify_id,
+                "category": "",
+                "r_label": "",
+            }
+        })
+        return artist_ids[artist_spotify_id], new_artists
+
+    def _write_albums(self, connection, artist_id, staged):
+        """
+        Write stage_albums() rows for an artist on connection without committing.
+        """
+        albums, songs, album_links = staged["albums"], staged["songs"], staged["album_links"]
+
+        album_ids, new_albums = self._insert_missing(connection, "albums", {
+            album_spotify_id: {
+                "name": album_info.get("name"),
+                "artist_id": artist_id,
+                "spotify_album_id": album_spotify_id,
+                "spotify_url": album_info.get("external_urls", {}).get("spotify"),
+            }
+            for album_spotify_id, album_info in albums.items()
+        })
+
+        song_ids, new_songs = self._insert_missing(connection, "songs", {
+            song_spotify_id: {
+                "name": song_info.get("name"),
+                "main_artist_id": artist_id,
+                "spotify_id": song_spotify_id,
+                "spotify_url": song_info.get("external_urls", {}).get("spotify"),
+                "album_id": album_ids[album_spotify_id],
+            }
+            for song_spotify_id, (song_info, album_spotify_id) in songs.items()
+        })
+
+        # The link tables are filtered against what is stored as well as inserted with
+        # INSERT IGNORE, since song_artists may not carry a unique key on the pair.
+        linked_albums = self._existing_links(connection, "album_songs", song_ids.values())
+        album_song_rows = {
+            (album_ids[album_spotify_id], song_ids[song_spotify_id])
+            for album_spotify_id, song_spotify_id in album_links
+        } - linked_albums
+        linked_artists = self._existing_links(connection, "song_artists", song_ids.values())
+        artist_song_rows = {(artist_id, song_id) for song_id in song_ids.values()} - linked_artists
+
+        self.db.insert_many("album_songs",
+                            [{"album_id": album_id, "song_id": song_id} for album_id, song_id in sorted(album_song_rows)],
+                            chunk_size=self.chunk_size, ignore=True, commit=False, connection=connection)
+        self.db.insert_many("song_artists",
+                            [{"artist_id": owner_id, "song_id": song_id} for owner_id, song_id in sorted(artist_song_rows)],
+                            chunk_size=self.chunk_size, ignore=True, commit=False, connection=connection)
+
+        return {
+            "albums": new_albums,
+            "songs": new_songs,
+            "album_links": len(album_song_rows),
+            "artist_links": len(artist_song_rows),
+        }
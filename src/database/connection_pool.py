@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    def __init__(self, pool_size=5, pool_recycle=3600, ping_interval=30, checkout_timeout=30, **connect_args):
+        """
+        Initialize a pool of reusable MySQL connections.
+
+        Args:
+            pool_size (int): Maximum number of open connections.
+            pool_recycle (int): Close connections older than this many seconds instead of reusing them.
+            ping_interval (int): Ping a connection on checkout if it has been idle longer than this.
+            checkout_timeout (int): Seconds to wait for a free connection before raising PoolError.
+            **connect_args: Arguments passed to mysql.connector.connect().
+        """
+        self.pool_size = pool_size
+        self.pool_recycle = pool_recycle
+        self.ping_interval = ping_interval
+        self.checkout_timeout = checkout_timeout
+        self.connect_args = connect_args
+
+        self._idle = deque()  # (connection, created_at, last_used), most recently used on the right
+        self._created_at = {}  # id(connection) -> creation time for every open connection
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._metrics = {
+            "created": 0,
+            "reused": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "waits": 0,
+        }
+
+    def _open(self):
+        """Open a new raw connection."""
+        connection = mysql.connector.connect(**self.connect_args)
+        self._created_at[id(connection)] = time.monotonic()
+        self._metrics["created"] += 1
+        logger.info("Opened new pooled database connection.")
+        return connection
+
+    def _discard(self, connection):
+        """Close a connection and forget about it."""
+        self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def _is_expired(self, connection):
+        created_at = self._created_at.get(id(connection))
+        return created_at is None or time.monotonic() - created_at > self.pool_recycle
+
+    def _is_healthy(self, connection, last_used):
+        """Ping connections that sat idle long enough for the server to have dropped them."""
+        if time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            self._metrics["ping_failures"] += 1
+            return False
+
+    def acquire(self):
+        """
+        Check out a connection, reusing an idle one when possible.
+        Raises PoolError if no connection becomes free within checkout_timeout.
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection, _, last_used = self._idle.pop()
+                    if self._is_expired(connection):
+                        self._metrics["recycled"] += 1
+                        self._discard(connection)
+                        continue
+                    if not self._is_healthy(connection, last_used):
+                        self._discard(connection)
+                        continue
+                    self._in_use += 1
+                    self._metrics["reused"] += 1
+                    self._metrics["checkouts"] += 1
+                    return connection
+
+                if self._in_use < self.pool_size:
+                    # Reserve the slot before connecting so concurrent callers respect pool_size
+                    self._in_use += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(f"No database connection available after {self.checkout_timeout}s "
+                                    f"(pool_size={self.pool_size}).")
+                self._metrics["waits"] += 1
+                self._condition.wait(remaining)
+
+        try:
+            connection = self._open()
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._metrics["checkouts"] += 1
+        return connection
+
+    def release(self, connection):
+        """
+        Return a connection to the pool. Open transactions are rolled back and
+        expired or broken connections are closed.
+        """
+        with self._condition:
+            self._in_use -= 1
+            self._metrics["checkins"] += 1
+            try:
+                if connection.is_connected() and not self._is_expired(connection):
+                    if connection.in_transaction:
+                        connection.rollback()
+                    self._idle.append((connection, self._created_at[id(connection)], time.monotonic()))
+                else:
+                    if connection.is_connected():
+                        self._metrics["recycled"] += 1
+                    self._discard(connection)
+            except Error as e:
+                logger.warning(f"Discarding pooled connection after error on checkin: {e}")
+                self._discard(connection)
+            self._condition.notify()
+
+    def close_all(self):
+        """Close every idle connection. Connections still checked out are kept until released."""
+        with self._condition:
+            while self._idle:
+                connection, _, _ = self._idle.pop()
+                self._discard(connection)
+        logger.info("Closed all idle pooled database connections.")
+
+    def stats(self):
+        """Return a snapshot of pool usage metrics."""
+        with self._condition:
+            return {
+                **self._metrics,
+                "pool_size": self.pool_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+            }
@@ -0,0 +1,185 @@
+import logging
+from itertools import islice
+from src.database.db_setup import DBSetup
+
+logger = logging.getLogger(__name__)
+
+
+class CountviewLatest:
+    """
+    Keeps '<countview table>_latest' tables with one row per song holding its most recent
+    countview, so current totals can be summed without scanning the countview history.
+    """
+    HISTORY_TABLES = ("spotify_song_countview", "youtube_song_countview", "youtubemsc_song_countview")
+    COLUMNS = ("song_id", "artist_id", "countview", "song_name", "album_name", "album_id", "scraped_at")
+
+    # Set once this process has made sure the latest tables exist
+    _tables_ready = False
+
+    @staticmethod
+    def table_for(history_table):
+        return f"{history_table}_latest"
+
+    @staticmethod
+    def _ensure_tables(db):
+        """
+        Create missing latest tables and fill them from their history, once per process.
+        """
+        if CountviewLatest._tables_ready:
+            return
+        if not db.is_connected():
+            db.connect()
+        missing = [
+            history_table for history_table in CountviewLatest.HISTORY_TABLES
+            if db.fetch_one(
+                "SELECT 1 AS found FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                (CountviewLatest.table_for(history_table),)
+            ) is None
+        ]
+        if missing:
+            DBSetup(db).create_latest_countview_tables()
+            for history_table in missing:
+                CountviewLatest.backfill(db, history_table)
+        CountviewLatest._tables_ready = True
+
+    @staticmethod
+    def upsert(db, history_table, rows, connection, chunk_size=500):
+        """
+        Upsert freshly captured countviews into the latest table of history_table.
+
+        Call this with the connection that writes the same rows to the history table, before
+        that insert and before committing, so both tables change in one transaction. The first
+        call in a process creates any missing latest table and backfills it from its history on
+        other connections, which must not wait on history rows this transaction already wrote.
+        scraped_at is set with the database clock, like the CURRENT_TIMESTAMP default of the
+        history tables.
+
+        Args:
+            db: DBConnector, used to create missing latest tables.
+            history_table (str): One of CountviewLatest.HISTORY_TABLES.
+            rows (list): Dicts with song_id, artist_id, countview, song_name, album_name, album_id.
+            connection: Open connection; the caller commits.
+            chunk_size (int): Number of rows per INSERT statement.
+        """
+        CountviewLatest._ensure_tables(db)
+        columns = CountviewLatest.COLUMNS[:-1]
+        row_placeholder = f"({', '.join(['%s'] * len(columns))}, NOW())"
+        updates = ", ".join(f"{column} = VALUES({column})" for column in CountviewLatest.COLUMNS[1:])
+        rows = iter(rows)
+        cursor = connection.cursor()
+        try:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                cursor.execute(
+                    f"INSERT INTO {CountviewLatest.table_for(history_table)} ({', '.join(CountviewLatest.COLUMNS)}) "
+                    f"VALUES {', '.join([row_placeholder] * len(chunk))} "
+                    f"ON DUPLICATE KEY UPDATE {updates}",
+                    [row.get(column) for row in chunk for column in columns]
+                )
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def rebuild(db, history_tables=None):
+        """
+        Rebuild latest tables from the full countview history.
+
+        Args:
+            db: DBConnector.
+            history_tables (list): Tables to rebuild. Defaults to all of them.
+
+        Returns:
+            dict: Mapping of latest table name to the number of rows written.
+        """
+        if not db.is_connected():
+            db.connect()
+        DBSetup(db).create_latest_countview_tables()
+
+        columns = ", ".join(CountviewLatest.COLUMNS)
+        written = {}
+        for history_table in history_tables or CountviewLatest.HISTORY_TABLES:
+            latest_table = CountviewLatest.table_for(history_table)
+            with db.checkout() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(f"DELETE FROM {latest_table}")
+                    cursor.execute(f"""
+                        INSERT INTO {latest_table} ({columns})
+                        SELECT {columns}
+                        FROM (
+                            SELECT {columns},
+                                   ROW_NUMBER() OVER (PARTITION BY song_id ORDER BY scraped_at DESC) AS capture_rank
+                            FROM {history_table}
+                        ) ranked
+                        WHERE capture_rank = 1
+                    """)
+                    written[latest_table] = cursor.rowcount
+                    connection.commit()
+                    logger.info(f"Rebuilt {latest_table} with {cursor.rowcount} songs.")
+                except Exception as e:
+                    logger.error(f"Error rebuilding {latest_table}: {e}")
+                    connection.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        return written
+
+    @staticmethod
+    def backfill(db, history_table):
+        """
+        Add the most recent capture of every song that has history but no row in the latest table.
+        Songs already in the latest table are left alone.
+
+        Returns:
+            int: Number of songs added.
+        """
+        latest_table = CountviewLatest.table_for(history_table)
+        columns = ", ".join(CountviewLatest.COLUMNS)
+        history_columns = ", ".join(f"h.{column}" for column in CountviewLatest.COLUMNS)
+        with db.checkout() as connection:
+            cursor = connection.cursor()
+            try:
+                # IGNORE: a writer may add one of the songs between the anti-join and the insert
+                cursor.execute(f"""
+                    INSERT IGNORE INTO {latest_table} ({columns})
+                    SELECT {columns}
+                    FROM (
+                        SELECT {history_columns},
+                               ROW_NUMBER() OVER (PARTITION BY h.song_id ORDER BY h.scraped_at DESC) AS capture_rank
+                        FROM {history_table} h
+                        LEFT JOIN {latest_table} l ON l.song_id = h.song_id
+                        WHERE l.song_id IS NULL
+                    ) ranked
+                    WHERE capture_rank = 1
+                """)
+                added = cursor.rowcount
+                connection.commit()
+            except Exception as e:
+                logger.error(f"Error backfilling {latest_table}: {e}")
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+        if added:
+            logger.info(f"Backfilled {added} songs missing from {latest_table}.")
+        return added
+
+    @staticmethod
+    def ensure_built(db):
+        """
+        Create the latest tables if needed and backfill every song whose history has no latest row,
+        so totals summed from them cover the whole history.
+
+        Returns:
+            dict: Mapping of latest table name to the number of songs backfilled.
+        """
+        if not db.is_connected():
+            db.connect()
+        DBSetup(db).create_latest_countview_tables()
+        CountviewLatest._tables_ready = True
+        return {
+            CountviewLatest.table_for(history_table): CountviewLatest.backfill(db, history_table)
+            for history_table in CountviewLatest.HISTORY_TABLES
+        }
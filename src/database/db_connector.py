@@ -1,6 +1,10 @@
-import mysql.connector
+from contextlib import contextmanager
+from itertools import islice
 from mysql.connector import Error
 import logging
+import time
+
+from src.database.connection_pool import ConnectionPool
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -8,33 +12,57 @@ logger = logging.getLogger(__name__)
 
 
 class DBConnector:
-    def __init__(self, host, database, user, password):
+    LOG_MODES = ("full", "summary")
+    # The primary connection holds a pool slot for the connector's lifetime, and jobs such as
+    # YouTubeAPI.update_all_views stream on one pooled connection while writing on another
+    MIN_POOL_SIZE = 3
+
+    def __init__(self, host, database, user, password, pool_size=5, pool_recycle=3600, log_mode="full"):
         """
         Initialize the DBConnector with database credentials.
+        Connections are drawn from a pool of at most pool_size connections,
+        each recycled after pool_recycle seconds.
+        pool_size must be at least MIN_POOL_SIZE.
+        With log_mode="summary" queries are logged as row counts and timings
+        instead of full statements and results.
         """
+        if log_mode not in self.LOG_MODES:
+            raise ValueError(f"log_mode must be one of {self.LOG_MODES}, got {log_mode!r}")
+        if pool_size < self.MIN_POOL_SIZE:
+            raise ValueError(f"pool_size must be at least {self.MIN_POOL_SIZE}, got {pool_size}")
         self.host = host
         self.database = database
         self.user = user
         self.password = password
+        self.log_mode = log_mode
         self.connection = None
+        self.pool = ConnectionPool(
+            pool_size=pool_size,
+            pool_recycle=pool_recycle,
+            host=host,
+            database=database,
+            user=user,
+            password=password
+        )
 
     def connect(self):
         """
-        Establish a connection to the MySQL database.
+        Check out the primary connection from the pool.
+        Reuses the current connection if it is still open.
         Returns the connection object if successful, otherwise None.
         """
+        if self.is_connected():
+            return self.connection
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password
-            )
+            if self.connection is not None:
+                self.pool.release(self.connection)
+            self.connection = self.pool.acquire()
             if self.connection.is_connected():
                 logger.info("Connection to the database established successfully.")
                 return self.connection
         except Error as e:
             logger.error(f"Error while connecting to MySQL: {e}")
+            self.connection = None
             return None
 
     def is_connected(self):
@@ -45,22 +73,61 @@ class DBConnector:
 
     def close(self):
         """
-        Close the database connection if it is open.
+        Return the primary connection to the pool.
+        """
+        if self.connection is not None:
+            self.pool.release(self.connection)
+            self.connection = None
+            logger.debug("Database connection returned to the pool.")
+
+    def dispose(self):
+        """
+        Release the primary connection and close every pooled connection.
+        """
+        self.close()
+        self.pool.close_all()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Check out a dedicated connection for the duration of a with-block.
+
+        Example:
+            with db.checkout() as connection:
+                cursor = connection.cursor()
+        """
+        connection = self.pool.acquire()
+        try:
+            yield connection
+        finally:
+            self.pool.release(connection)
+
+    def pool_stats(self):
+        """
+        Return connection pool metrics (created, reused, recycled, in_use, idle, ...).
+        """
+        return self.pool.stats()
+
+    def _log_result(self, action, detail, row_count, started):
+        """
+        Log a finished statement according to the configured log mode.
         """
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("Database connection closed.")
+        if self.log_mode == "summary":
+            logger.info(f"{action}: {row_count} rows in {time.perf_counter() - started:.3f}s")
+        else:
+            logger.info(f"{action}: {detail}")
 
     def execute_query(self, query, params=None):
         """
         Execute a SQL query and return the result.
         """
         cursor = None
+        started = time.perf_counter()
         try:
             cursor = self.connection.cursor(dictionary=True)  # Return results as dictionaries
             cursor.execute(query, params or ())
             self.connection.commit()
-            logger.info(f"Query executed successfully: {query}")
+            self._log_result("Query executed successfully", query, cursor.rowcount, started)
             return cursor
         except Error as e:
             logger.error(f"Error executing query: {query}. Error: {e}")
@@ -76,11 +143,12 @@ class DBConnector:
         Fetch a single row from the database.
         """
         cursor = None
+        started = time.perf_counter()
         try:
             cursor = self.connection.cursor(dictionary=True)  # Return results as dictionaries
             cursor.execute(query, params or ())
             result = cursor.fetchone()
-            logger.info(f"Fetched one row: {result}")
+            self._log_result("Fetched one row", result, int(result is not None), started)
             return result
         except Error as e:
             logger.error(f"Error fetching one row: {e}")
@@ -94,11 +162,12 @@ class DBConnector:
         Fetch all rows from the database.
         """
         cursor = None
+        started = time.perf_counter()
         try:
             cursor = self.connection.cursor(dictionary=True)  # Return results as dictionaries
             cursor.execute(query, params or ())
             result = cursor.fetchall()
-            logger.info(f"Fetched all rows: {result}")
+            self._log_result("Fetched all rows", result, len(result), started)
             return result
         except Error as e:
             logger.error(f"Error fetching all rows: {e}")
@@ -107,6 +176,48 @@ class DBConnector:
             if cursor:
                 cursor.close()
 
+    def stream(self, query, params=None, batch_size=1000, dictionary=True, batches=False):
+        """
+        Iterate over a large result set without materializing it.
+
+        Rows are read from an unbuffered cursor on a dedicated pooled connection,
+        batch_size rows at a time, so memory stays bounded by the batch size.
+
+        Args:
+            query (str): SELECT statement.
+            params (tuple): Query parameters.
+            batch_size (int): Number of rows fetched from the server per round trip.
+            dictionary (bool): Yield rows as dictionaries (True) or tuples (False).
+            batches (bool): Yield lists of up to batch_size rows instead of single rows.
+
+        Yields:
+            dict | tuple | list: A row, or a batch of rows if batches is True.
+        """
+        started = time.perf_counter()
+        row_count = 0
+        with self.checkout() as connection:
+            cursor = connection.cursor(buffered=False, dictionary=dictionary)
+            try:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    row_count += len(rows)
+                    if batches:
+                        yield rows
+                    else:
+                        yield from rows
+            except Error as e:
+                logger.error(f"Error streaming rows: {e}")
+                raise
+            finally:
+                # Drain rows left behind when the caller stops iterating early
+                if connection.unread_result:
+                    connection.consume_results()
+                cursor.close()
+                logger.info(f"Streamed {row_count} rows in {time.perf_counter() - started:.3f}s")
+
     def insert(self, table, data):
         """
         Insert a row into the specified table.
@@ -116,6 +227,85 @@ class DBConnector:
         query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
         self.execute_query(query, tuple(data.values()))
 
+    def insert_many(self, table, rows, chunk_size=500, ignore=False, commit=True, connection=None):
+        """
+        Insert many rows with multi-row INSERT statements, committing once per chunk.
+
+        Args:
+            table (str): Target table.
+            rows (iterable): Dictionaries that all share the same keys.
+            chunk_size (int): Number of rows per INSERT statement.
+            ignore (bool): Use INSERT IGNORE to skip rows that hit a duplicate key.
+            commit (bool): Commit after each chunk. Pass False to let the caller commit.
+            connection: Connection to write on. Defaults to the primary connection.
+
+        Returns:
+            int: Number of affected rows.
+        """
+        verb = "INSERT IGNORE" if ignore else "INSERT"
+        return self._write_many(table, rows, verb, None, chunk_size, commit, connection)
+
+    def upsert_many(self, table, rows, update_columns=None, chunk_size=500, commit=True, connection=None):
+        """
+        Insert many rows with multi-row INSERT ... ON DUPLICATE KEY UPDATE statements,
+        committing once per chunk.
+
+        Args:
+            table (str): Target table.
+            rows (iterable): Dictionaries that all share the same keys.
+            update_columns (list): Columns to overwrite on duplicate keys. Defaults to every column.
+            chunk_size (int): Number of rows per INSERT statement.
+            commit (bool): Commit after each chunk. Pass False to let the caller commit.
+            connection: Connection to write on. Defaults to the primary connection.
+
+        Returns:
+            int: Number of affected rows.
+        """
+        return self._write_many(table, rows, "INSERT", update_columns or (), chunk_size, commit, connection)
+
+    def _write_many(self, table, rows, verb, update_columns, chunk_size, commit, connection):
+        """
+        Shared implementation of insert_many and upsert_many.
+        update_columns is None for plain inserts and a (possibly empty) sequence for upserts.
+        """
+        if connection is None:
+            if not self.is_connected():
+                self.connect()
+            connection = self.connection
+
+        rows = iter(rows)
+        affected = 0
+        cursor = connection.cursor()
+        try:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+
+                columns = list(chunk[0].keys())
+                row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+                query = (f"{verb} INTO {table} ({', '.join(columns)}) "
+                         f"VALUES {', '.join([row_placeholder] * len(chunk))}")
+                if update_columns is not None:
+                    updates = update_columns or columns
+                    query += " ON DUPLICATE KEY UPDATE " + ', '.join(
+                        f"{column} = VALUES({column})" for column in updates
+                    )
+
+                params = [row[column] for row in chunk for column in columns]
+                cursor.execute(query, params)
+                affected += cursor.rowcount
+                if commit:
+                    connection.commit()
+                logger.info(f"Wrote {len(chunk)} rows to {table}.")
+            return affected
+        except Error as e:
+            logger.error(f"Error writing rows to {table}: {e}")
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
     def update(self, table, data, condition):
         """
         Update rows in the specified table based on a condition.
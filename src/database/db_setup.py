@@ -42,6 +42,21 @@ class DBSetup:
             # SpotifyArtistData table
             self._create_spotify_artist_data_table()
 
+            # Scrape run checkpoints
+            self.create_checkpoint_tables()
+
+            # Latest countview snapshot per song
+            self.create_latest_countview_tables()
+
+            # Media kit change tracking
+            self.create_change_tracking_tables()
+
+            # Raw data files already ingested
+            self.create_ingestion_tables()
+
+            # Refresh attempts of the incremental refresh
+            self.create_refresh_tables()
+
             logger.info("All tables created successfully.")
         except Exception as e:
             logger.error(f"Error creating tables: {e}")
@@ -205,6 +220,143 @@ class DBSetup:
         self.db.execute_query(query)
         logger.info("Created 'spotify_artist_data' table.")
 
+    def create_checkpoint_tables(self):
+        """
+        Create the tables used to checkpoint and resume scrape runs.
+        """
+        self._create_scrape_runs_table()
+        self._create_scrape_run_items_table()
+
+    def _create_scrape_runs_table(self):
+        """
+        Create the 'scrape_runs' table.
+        """
+        query = """
+            CREATE TABLE IF NOT EXISTS scrape_runs (
+                run_id INT AUTO_INCREMENT PRIMARY KEY,
+                job VARCHAR(100) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'running',
+                total_items INT,
+                processed_items INT NOT NULL DEFAULT 0,
+                last_item_id INT,
+                started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                finished_at DATETIME,
+                INDEX idx_scrape_runs_job_status (job, status)
+            )
+        """
+        self.db.execute_query(query)
+        logger.info("Created 'scrape_runs' table.")
+
+    def _create_scrape_run_items_table(self):
+        """
+        Create the 'scrape_run_items' table.
+        """
+        query = """
+            CREATE TABLE IF NOT EXISTS scrape_run_items (
+                run_id INT NOT NULL,
+                item_id INT NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (run_id, item_id),
+                FOREIGN KEY (run_id) REFERENCES scrape_runs(run_id) ON DELETE CASCADE
+            )
+        """
+        self.db.execute_query(query)
+        logger.info("Created 'scrape_run_items' table.")
+
+    def create_latest_countview_tables(self):
+        """
+        Create the '<countview table>_latest' tables holding the most recent countview per song.
+        """
+        for history_table in ("spotify_song_countview", "youtube_song_countview", "youtubemsc_song_countview"):
+            self._create_latest_countview_table(history_table)
+
+    def _create_latest_countview_table(self, history_table):
+        """
+        Create the latest-snapshot table for one countview history table.
+        """
+        query = f"""
+            CREATE TABLE IF NOT EXISTS {history_table}_latest (
+                song_id INT PRIMARY KEY,
+                artist_id INT,
+                countview BIGINT,
+                song_name VARCHAR(255),
+                album_name VARCHAR(255),
+                album_id INT,
+                scraped_at DATETIME,
+                INDEX idx_{history_table}_latest_artist (artist_id)
+            )
+        """
+        self.db.execute_query(query)
+        logger.info(f"Created '{history_table}_latest' table.")
+
+    def create_change_tracking_tables(self):
+        """
+        Create the tables used to recompute media kit data incrementally.
+        """
+        self._create_media_kit_watermarks_table()
+
+    def _create_media_kit_watermarks_table(self):
+        """
+        Create the 'media_kit_watermarks' table.
+        """
+        query = """
+            CREATE TABLE IF NOT EXISTS media_kit_watermarks (
+                source_table VARCHAR(100) PRIMARY KEY,
+                high_water_mark DATETIME,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """
+        self.db.execute_query(query)
+        logger.info("Created 'media_kit_watermarks' table.")
+
+    def create_ingestion_tables(self):
+        """
+        Create the tables used to ingest raw data files incrementally.
+        """
+        self._create_raw_file_manifest_table()
+
+    def _create_raw_file_manifest_table(self):
+        """
+        Create the 'raw_file_manifest' table.
+        """
+        query = """
+            CREATE TABLE IF NOT EXISTS raw_file_manifest (
+                filename VARCHAR(255) PRIMARY KEY,
+                size_bytes BIGINT NOT NULL,
+                mtime DOUBLE NOT NULL,
+                content_hash CHAR(64) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                error TEXT,
+                processed_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """
+        self.db.execute_query(query)
+        logger.info("Created 'raw_file_manifest' table.")
+
+    def create_refresh_tables(self):
+        """
+        Create the tables used to schedule incremental refreshes.
+        """
+        self._create_refresh_attempts_table()
+
+    def _create_refresh_attempts_table(self):
+        """
+        Create the 'refresh_attempts' table.
+        """
+        query = """
+            CREATE TABLE IF NOT EXISTS refresh_attempts (
+                source VARCHAR(50) NOT NULL,
+                entity_id VARCHAR(64) NOT NULL,
+                failed_attempts INT NOT NULL DEFAULT 0,
+                attempted_at DATETIME NOT NULL,
+                PRIMARY KEY (source, entity_id)
+            )
+        """
+        self.db.execute_query(query)
+        logger.info("Created 'refresh_attempts' table.")
+
 
 if __name__ == "__main__":
     # Initialize the database connector
@@ -0,0 +1,77 @@
+import logging
+from src.database.db_setup import DBSetup
+
+logger = logging.getLogger(__name__)
+
+
+class RawFileManifest:
+    LOADED = "loaded"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+    # Outcomes that stay valid until the file changes; failed files are retried on every run
+    TERMINAL = (LOADED, SKIPPED)
+
+    def __init__(self, db_connector):
+        """
+        Remember which raw data files were ingested, so unchanged files are not loaded again.
+
+        Args:
+            db_connector: Database connector object.
+        """
+        self.db_connector = db_connector
+        self._tables_ready = False
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            if not self.db_connector.is_connected():
+                self.db_connector.connect()
+            DBSetup(self.db_connector).create_ingestion_tables()
+            self._tables_ready = True
+
+    def entries(self):
+        """
+        Return {filename: row} for every file in the manifest.
+        """
+        self._ensure_tables()
+        rows = self.db_connector.fetch_all(
+            "SELECT filename, size_bytes, mtime, content_hash, status, error FROM raw_file_manifest"
+        )
+        return {row['filename']: row for row in rows}
+
+    @staticmethod
+    def is_unchanged(entry, size_bytes, mtime):
+        """
+        Return True if a manifest entry says the file was loaded or skipped with this size and mtime.
+        """
+        return (entry is not None and entry['status'] in RawFileManifest.TERMINAL
+                and entry['size_bytes'] == size_bytes and entry['mtime'] == mtime)
+
+    def record(self, filename, size_bytes, mtime, content_hash, status, error=None, connection=None):
+        """
+        Store the outcome of processing a file.
+
+        Args:
+            filename (str): File name relative to the raw data directory.
+            size_bytes (int): File size when it was read.
+            mtime (float): File modification time when it was read.
+            content_hash (str): SHA-256 hex digest of the file contents.
+            status (str): RawFileManifest.LOADED, SKIPPED or FAILED.
+            error (str): Why the file was skipped or failed.
+            connection: Connection whose transaction the update should join. The caller
+                commits it. Without one, the update is committed on its own connection.
+        """
+        self._ensure_tables()
+        row = {
+            "filename": filename,
+            "size_bytes": size_bytes,
+            "mtime": mtime,
+            "content_hash": content_hash,
+            "status": status,
+            "error": error,
+        }
+        if connection is None:
+            with self.db_connector.checkout() as connection:
+                self.db_connector.upsert_many("raw_file_manifest", [row], commit=False, connection=connection)
+                connection.commit()
+            return
+        self.db_connector.upsert_many("raw_file_manifest", [row], commit=False, connection=connection)
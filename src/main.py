@@ -1,22 +1,26 @@
-import json
+import argparse
 from datetime import datetime
 from src.models.album_songs import AlbumSongs
 from src.models.artist import Artist
-from src.models.artist_song import ArtistSongs
 from src.models.song import Song
 from src.models.album import Album
 from src.models.playlist import Playlist
 from src.scapers.spotify_monthly_listeners import MonthlyListeners
 from src.apis.spotify_api import SpotifyAPI
 from src.database.db_connector import DBConnector
+from src.database.countview_latest import CountviewLatest
+from config.db_config import DBConfig
 from dotenv import load_dotenv
 from src.apis.youtube_api import YouTubeAPI
 from src.apis.youtube_music_api import YouTubeMusicAPI
 from src.data_processor.media_kit_transformer import MediaKitTransformer
+from src.data_processor.refresh_scheduler import RefreshScheduler
+from src.data_processor.spotify_json_loader import SpotifyJsonLoader
+from src.data_processor.discography_files import write_discography
+from src.data_processor.discography_archive import ARCHIVE_DIR, archive_directory
 from src.upload_bot.google_sheets_uploader import GoogleSheetsUploader
 import os
 import sys
-import io
 
 from src.scapers.spotify_songs_countview import SpotifySongsCountView
 
@@ -27,30 +31,84 @@ load_dotenv()
 
 
 class ETLSystem:
-    def __init__(self):
+    def __init__(self, full_media_kit=False):
         """
         Initialize the ETL system with a database connection.
+
+        Args:
+            full_media_kit (bool): Recompute media kit data for every artist instead of only
+                the artists with new data since the last run.
         """
+        self.full_media_kit = full_media_kit
         self.db = DBConnector(
             host=os.getenv('DB_HOST'),
             database=os.getenv('DB_NAME'),
             user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD')
+            password=os.getenv('DB_PASSWORD'),
+            pool_size=DBConfig.POOL_SIZE,
+            pool_recycle=DBConfig.POOL_RECYCLE,
+            log_mode=DBConfig.LOG_MODE
         )
         self.db.connect()
-        self.spotify_api = SpotifyAPI()
 
-        # Initialize YouTube API and Scraper
-        self.youtube_api = YouTubeAPI(api_key=os.getenv('YOUTUBE_API_KEY'), db=self.db)
-        self.youtube_music_api = YouTubeMusicAPI(api_key=os.getenv('YOUTUBE_API_KEY'), db=self.db)
+        # API clients, scrapers and uploaders are created on first use and released after each job,
+        # so options that do not need them never authenticate, build discovery clients or start Chrome
+        self._clients = {}
+        # Shared by every SpotifyAPI client so cached responses are reused across options
+        self.spotify_cache = SpotifyAPI.default_cache()
+
+    def _client(self, name, factory):
+        """
+        Return the client registered under name, creating it with factory on first use.
+        """
+        if name not in self._clients:
+            self._clients[name] = factory()
+        return self._clients[name]
+
+    @property
+    def spotify_api(self):
+        return self._client("spotify_api", lambda: SpotifyAPI(cache=self.spotify_cache))
+
+    @property
+    def youtube_api(self):
+        return self._client("youtube_api", lambda: YouTubeAPI(api_key=os.getenv('YOUTUBE_API_KEY'), db=self.db))
+
+    @property
+    def youtube_music_api(self):
+        return self._client("youtube_music_api",
+                            lambda: YouTubeMusicAPI(api_key=os.getenv('YOUTUBE_API_KEY'), db=self.db))
+
+    @property
+    def spotify_songs_countview(self):
+        return self._client("spotify_songs_countview", lambda: SpotifySongsCountView(
+            self.db, workers=int(os.getenv('SCRAPER_WORKERS', 1))
+        ))
 
+    @property
+    def monthly_listeners(self):
+        return self._client("monthly_listeners", lambda: MonthlyListeners(self.db))
 
-        # Initialize SpotifySongsCountView
-        self.spotify_songs_countview = SpotifySongsCountView(self.db)
+    @property
+    def media_kit_transformer(self):
+        return self._client("media_kit_transformer", lambda: MediaKitTransformer(self.db))
 
-        # Initialize MediaKitTransformer and GoogleSheetsUploader
-        self.media_kit_transformer = MediaKitTransformer(self.db)
-        self.google_sheets_uploader = GoogleSheetsUploader(self.db)
+    @property
+    def google_sheets_uploader(self):
+        return self._client("google_sheets_uploader", lambda: GoogleSheetsUploader(self.db))
+
+    def _release_clients(self):
+        """
+        Close and forget every client created since the last release.
+        """
+        while self._clients:
+            name, client = self._clients.popitem()
+            close = getattr(client, "close", None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing {name}: {e}")
 
     @staticmethod
     def display_menu():
@@ -83,13 +141,20 @@ class ETLSystem:
         print("23: Atualizar Media Kit Data")  # New option
         print("24: Carregar Media Kit Data para Google Sheets")  # New option
         print("25: Sair")
+        print("26: Atualizar visualizações do YouTube e YouTube Music (API)")
+        print("27: Atualização incremental (itens mais desatualizados)")
+        print("28: Reconstruir tabelas de visualizações mais recentes")
         print("29: Backfill Countview Data")  # Add this line
+        print("30: Arquivar dados brutos do Spotify (Parquet)")
+        print("31: Alimentar banco de dados spotify a partir do arquivo Parquet")
 
     def run(self):
         """
         Run the ETL system and handle user input.
         """
         while True:
+            # Tear down whatever the previous option started before waiting for the next one
+            self._release_clients()
             self.display_menu()
             choice = input("Digite a opção escolhida: ").strip()
 
@@ -144,13 +209,31 @@ class ETLSystem:
             elif choice == '25':
                 print("Exiting...")
                 break
+            elif choice == '26':
+                self._update_all_youtube_views_api()
+            elif choice == '27':
+                self._run_incremental_refresh()
+            elif choice == '28':
+                self._rebuild_latest_countviews()
             elif choice == '29':
                 self.backfill_countview_data()
+            elif choice == '30':
+                self._archive_raw_data()
+            elif choice == '31':
+                self._populate_database_from_json(from_archive=True)
             else:
                 print("Invalid choice. Please try again.")
 
         self.close()
 
+    def close(self):
+        """
+        Release the clients, the Spotify response cache and all pooled database connections.
+        """
+        self._release_clients()
+        self.spotify_cache.close()
+        self.db.dispose()
+
     def _update_songs_countview(self):
         """Update countviews for all songs."""
         self.spotify_songs_countview.update_all_songs_countview()
@@ -293,7 +376,7 @@ class ETLSystem:
         """
         playlist_name = input("Playlist Name (leave blank to use Spotify name): ")
         spotify_playlist_id = input("Spotify Playlist ID: ")
-        Playlist.add_playlist_from_spotify(self.db, spotify_playlist_id, playlist_name)
+        Playlist.add_playlist_from_spotify(self.db, spotify_playlist_id, playlist_name, spotify_api=self.spotify_api)
         print("Playlist added successfully!")
 
     def _edit_playlist(self):
@@ -385,7 +468,7 @@ class ETLSystem:
         """
         Fetch and update monthly listeners for all artists.
         """
-        MonthlyListeners(self.db).update_all_artists()
+        self.monthly_listeners.update_all_artists()
         print("Monthly listeners updated successfully!")
 
     def _fetch_spotify_artist_data(self):
@@ -394,15 +477,22 @@ class ETLSystem:
         """
         artists = Artist.get_all(self.db)
         for artist in artists:
-            if artist.spotify_id:
-                try:
-                    self.spotify_api.fetch_and_store_artist_data(self.db, artist.spotify_id)
-                    print(f"Followers for artist {artist.name} saved successfully.")
-                except Exception as e:
-                    print(f"Error fetching data for artist {artist.name}: {e}")
-            else:
+            if not artist.spotify_id:
                 print(f"Artist {artist.name} does not have a Spotify ID. Skipping...")
 
+        spotify_ids = [artist.spotify_id for artist in artists if artist.spotify_id]
+        try:
+            saved = self.spotify_api.fetch_and_store_artists_data(self.db, spotify_ids)
+        except Exception as e:
+            print(f"Error fetching Spotify followers: {e}")
+            return
+
+        for artist in artists:
+            if artist.spotify_id in saved:
+                print(f"Followers for artist {artist.name} saved successfully.")
+            elif artist.spotify_id:
+                print(f"Error fetching data for artist {artist.name}: not found on Spotify")
+
     def _fetch_songs_by_artist(self):
         """
         Fetch and store songs for a given artist.
@@ -510,145 +600,72 @@ class ETLSystem:
 
     def _fetch_all_artist_info(self):
         """
-        Fetch all information about an artist from Spotify and save it as a JSON file in the data/raw directory.
+        Fetch all information about an artist from Spotify and save it in the data/raw directory
+        as compact JSON Lines, one line per album, compressed as set by RAW_DATA_COMPRESSION.
         """
         artist_spotify_id = input("Enter the Artist Spotify ID: ").strip()
         try:
             # Fetch artist information
             artist_info = self.spotify_api.fetch_all_artist_info(artist_spotify_id)
 
-            # Generate the filename
+            # Generate the file name
             artist_name = artist_info['artist']['name'].replace(" ", "_").lower()
             current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = f"artist_information_{artist_name}_{current_date}.json"
+            basename = f"artist_information_{artist_name}_{current_date}"
 
-            # Define the raw data directory path
-            raw_data_dir = os.path.join("data", "raw")
-
-            # Ensure the raw_data directory exists (though it should already exist)
-            os.makedirs(raw_data_dir, exist_ok=True)
-
-            # Save the JSON response to a file
-            file_path = os.path.join(raw_data_dir, filename)
-            with io.TextIOWrapper(open(file_path, "wb"), encoding="utf-8") as json_file:
-                json.dump(artist_info, json_file, indent=4, default=str)
+            # Save the discography to the raw data directory
+            compression = os.getenv('RAW_DATA_COMPRESSION', 'gzip').lower()
+            file_path = write_discography(artist_info, os.path.join("data", "raw"), basename,
+                                          compression=None if compression == 'none' else compression)
             print(f"Artist information saved to {file_path}")
         except Exception as e:
             print(f"Error fetching artist information: {e}")
 
-    def _populate_database_from_json(self):
+    def _populate_database_from_json(self, from_archive=False):
+        """
+        Load the Spotify discographies in data/raw into the database, or, with from_archive,
+        the ones kept in the Parquet archive.
+        """
+        if from_archive:
+            artist_ids = input("Artist Spotify IDs, comma separated (leave blank for all): ").strip()
+            since = input("Only captures since (YYYY-MM-DD, leave blank for all): ").strip() or None
+            try:
+                summary = SpotifyJsonLoader(self.db).load_archive(
+                    ARCHIVE_DIR,
+                    artist_ids=[artist_id.strip() for artist_id in artist_ids.split(",")] if artist_ids else None,
+                    since=since,
+                )
+                print(f"Loaded {summary['loaded']} archived discographies, {summary['skipped']} skipped.")
+            except Exception as e:
+                print(f"Error loading from {ARCHIVE_DIR}: {e}")
+            return
+
         raw_data_dir = os.path.join("data", "raw")
         if not os.path.exists(raw_data_dir):
             print(f"Directory {raw_data_dir} does not exist.")
             return
 
-        album_songs = AlbumSongs(self.db)  # Create an instance of AlbumSongs
+        workers = int(os.getenv('INGEST_WORKERS', 0)) or None
+        try:
+            summary = SpotifyJsonLoader(self.db).load_directory(raw_data_dir, workers=workers)
+            print(f"Loaded {summary['loaded']} files, {summary['unchanged']} unchanged, "
+                  f"{summary['skipped']} skipped and {summary['failed']} failed.")
+        except Exception as e:
+            print(f"Error processing {raw_data_dir}: {e}")
+
+    def _archive_raw_data(self):
+        """
+        Compact the raw Spotify discographies in data/raw into the Parquet archive.
+        """
+        raw_data_dir = os.path.join("data", "raw")
+        if not os.path.exists(raw_data_dir):
+            print(f"Directory {raw_data_dir} does not exist.")
+            return
 
-        for filename in os.listdir(raw_data_dir):
-            if filename.endswith(".json"):
-                file_path = os.path.join(raw_data_dir, filename)
-                print(f"Processing file: {file_path}")
-
-                try:
-                    with open(file_path, "r", encoding="utf-8") as json_file:  # Explicitly specify encoding
-                        artist_data = json.load(json_file)
-
-                    # Debug: Print the JSON structure
-                    print("Artist Data:", json.dumps(artist_data, indent=4))
-
-                    # Extract artist information
-                    artist_info = artist_data.get("artist", {})
-                    spotify_id = artist_info.get("artist_id")
-                    if not spotify_id:
-                        print(f"Skipping file {filename}: Missing artist Spotify ID.")
-                        continue
-
-                    # Check if the artist already exists
-                    existing_artist = Artist.get_by_spotify_id(self.db, spotify_id)
-                    if existing_artist:
-                        print(f"Artist {artist_info.get('name')} already exists. Processing albums and songs...")
-                        artist = existing_artist
-                    else:
-                        # Insert the artist if they don't exist
-                        artist = Artist(
-                            name=artist_info.get("name"),
-                            spotify_id=spotify_id,
-                            category="",  # Default value
-                            r_label="",  # Default value
-                        )
-                        artist.save_to_db(self.db)
-                        print(f"Inserted artist: {artist_info.get('name')}")
-
-                    # Process albums
-                    for album_info in artist_data.get("albums", []):
-                        album_spotify_id = album_info.get("id")
-                        if not album_spotify_id:
-                            print("Skipping album: Missing Spotify ID.")
-                            continue
-
-                        # Check if the album already exists
-                        existing_album = Album.get_by_spotify_id(self.db, album_spotify_id)
-                        if existing_album:
-                            print(f"Album {album_info.get('name')} already exists. Processing songs...")
-                            album = existing_album
-                        else:
-                            # Insert the album if it doesn't exist
-                            album = Album(
-                                name=album_info.get("name"),
-                                artist_id=artist.artist_id,
-                                spotify_album_id=album_spotify_id,
-                                spotify_url=album_info.get("external_urls", {}).get("spotify"),
-                            )
-                            album.save_to_db(self.db)
-                            print(f"Inserted album: {album_info.get('name')}")
-
-                        # Process songs
-                        for song_info in album_info.get("tracks", []):
-                            print(f"Processing song: {song_info.get('name')}")
-                            song_spotify_id = song_info.get("id")
-                            if not song_spotify_id:
-                                print("Skipping song: Missing Spotify ID.")
-                                continue
-
-                            # Check if the song already exists
-                            existing_song = Song.get_by_spotify_id(self.db, song_spotify_id)
-                            if existing_song:
-                                print(f"Song {song_info.get('name')} already exists. Skipping.")
-                                song = existing_song
-                            else:
-                                # Insert the song if it doesn't exist
-                                song = Song(
-                                    name=song_info.get("name"),
-                                    main_artist_id=artist.artist_id,
-                                    spotify_id=song_spotify_id,
-                                    spotify_url=song_info.get("external_urls", {}).get("spotify"),
-                                    album_id=album.album_id,
-                                )
-                                print(f"Inserting song: {song.name} (Spotify ID: {song.spotify_id})")
-                                try:
-                                    song.save_to_db(self.db)
-                                    print(f"Inserted song: {song_info.get('name')}")
-                                except Exception as e:
-                                    print(f"Error saving song {song.name}: {e}")
-
-                            # Link song to album if not already linked
-                            if not album_songs.check_song_in_album(album.album_id, song.song_id):
-                                try:
-                                    album_songs.add_song_to_album(album.album_id, song.song_id)
-                                    print(f"Linked song {song.name} to album {album.name}")
-                                except Exception as e:
-                                    print(f"Error linking song to album: {e}")
-
-                            # Link song to artist if not already linked
-                            if not ArtistSongs.check_song_for_artist(self.db, artist.artist_id, song.song_id):
-                                try:
-                                    ArtistSongs.add_song_for_artist(self.db, artist.artist_id, song.song_id)
-                                    print(f"Linked song {song.name} to artist {artist.name}")
-                                except Exception as e:
-                                    print(f"Error linking song to artist: {e}")
-
-                except Exception as e:
-                    print(f"Error processing file {filename}: {e}")
+        remove_source = input("Delete raw files after archiving? (y/n): ").strip().lower() == 'y'
+        summary = archive_directory(raw_data_dir, ARCHIVE_DIR, remove_source=remove_source)
+        print(f"Archived {summary['archived']} files into {ARCHIVE_DIR}, "
+              f"{summary['skipped']} skipped and {summary['failed']} failed.")
 
     def _update_youtube_views_api(self):
         """Update YouTube views using the YouTube API."""
@@ -670,13 +687,56 @@ class ETLSystem:
         except Exception as e:
             print(f"Error updating YouTube Music views: {e}")
 
+    def _update_all_youtube_views_api(self):
+        """Update YouTube and YouTube Music views in a single pass using the YouTube API."""
+        try:
+            if not self.db.is_connected():
+                self.db.connect()
+            self.youtube_api.update_all_views()
+            print("YouTube and YouTube Music views updated successfully!")
+        except Exception as e:
+            print(f"Error updating YouTube and YouTube Music views: {e}")
+
+    def _run_incremental_refresh(self):
+        """
+        Refresh only the songs and artists the RefreshScheduler ranks as most overdue,
+        up to REFRESH_BUDGET entities per source.
+        """
+        try:
+            scheduler = RefreshScheduler(self.db, budget=int(os.getenv('REFRESH_BUDGET', 500)))
+            plan = scheduler.plan()
+
+            if plan["spotify_songs"]:
+                self.spotify_songs_countview.update_all_songs_countview(song_ids=plan["spotify_songs"])
+            if plan["youtube_songs"]:
+                self.youtube_api.update_all_views(song_ids=plan["youtube_songs"])
+            if plan["monthly_listeners"]:
+                self.monthly_listeners.update_all_artists(artist_ids=plan["monthly_listeners"])
+            if plan["spotify_followers"]:
+                self.spotify_api.fetch_and_store_artists_data(self.db, plan["spotify_followers"])
+
+            refreshed = ", ".join(f"{len(ids)} {source}" for source, ids in plan.items())
+            print(f"Incremental refresh finished ({refreshed}).")
+        except Exception as e:
+            print(f"Error running incremental refresh: {e}")
+
+    def _rebuild_latest_countviews(self):
+        """
+        Rebuild the *_song_countview_latest tables from the full countview history.
+        """
+        try:
+            written = CountviewLatest.rebuild(self.db)
+            for table, row_count in written.items():
+                print(f"Rebuilt {table} with {row_count} songs")
+        except Exception as e:
+            print(f"Error rebuilding latest countview tables: {e}")
 
     def _update_media_kit_data(self):
         """
         Update the media_kit_data table with transformed data.
         """
         try:
-            self.media_kit_transformer.transform_and_load()
+            self.media_kit_transformer.transform_and_load(full=self.full_media_kit)
             print("Media Kit Data updated successfully!")
         except Exception as e:
             print(f"Error updating Media Kit Data: {e}")
@@ -695,61 +755,65 @@ class ETLSystem:
         """
         Backfill song_name, album_name, and album_id for existing records in countview tables
         """
-        connection = self.db.connect()
-        cursor = connection.cursor()
+        with self.db.checkout() as connection:
+            cursor = connection.cursor()
 
-        try:
-            print("Starting countview data backfill...")
-
-            # Update spotify_song_countview
-            cursor.execute("""
-                UPDATE spotify_song_countview ssc
-                JOIN songs s ON ssc.song_id = s.song_id
-                LEFT JOIN albums a ON s.album_id = a.album_id
-                SET 
-                    ssc.song_name = s.name,
-                    ssc.album_name = a.name,
-                    ssc.album_id = s.album_id
-                WHERE ssc.song_name IS NULL
-            """)
-            print(f"Updated {cursor.rowcount} rows in spotify_song_countview")
-
-            # Update youtube_song_countview
-            cursor.execute("""
-                UPDATE youtube_song_countview ysc
-                JOIN songs s ON ysc.song_id = s.song_id
-                LEFT JOIN albums a ON s.album_id = a.album_id
-                SET 
-                    ysc.song_name = s.name,
-                    ysc.album_name = a.name,
-                    ysc.album_id = s.album_id
-                WHERE ysc.song_name IS NULL
-            """)
-            print(f"Updated {cursor.rowcount} rows in youtube_song_countview")
-
-            # Update youtubemsc_song_countview
-            cursor.execute("""
-                UPDATE youtubemsc_song_countview ymsc
-                JOIN songs s ON ymsc.song_id = s.song_id
-                LEFT JOIN albums a ON s.album_id = a.album_id
-                SET 
-                    ymsc.song_name = s.name,
-                    ymsc.album_name = a.name,
-                    ymsc.album_id = s.album_id
-                WHERE ymsc.song_name IS NULL
-            """)
-            print(f"Updated {cursor.rowcount} rows in youtubemsc_song_countview")
-
-            connection.commit()
-            print("Countview data backfill completed successfully!")
-        except Exception as e:
-            connection.rollback()
-            print(f"Error backfilling countview data: {e}")
-            raise
-        finally:
-            cursor.close()
-            connection.close()
+            try:
+                print("Starting countview data backfill...")
+
+                # Update spotify_song_countview
+                cursor.execute("""
+                    UPDATE spotify_song_countview ssc
+                    JOIN songs s ON ssc.song_id = s.song_id
+                    LEFT JOIN albums a ON s.album_id = a.album_id
+                    SET 
+                        ssc.song_name = s.name,
+                        ssc.album_name = a.name,
+                        ssc.album_id = s.album_id
+                    WHERE ssc.song_name IS NULL
+                """)
+                print(f"Updated {cursor.rowcount} rows in spotify_song_countview")
+
+                # Update youtube_song_countview
+                cursor.execute("""
+                    UPDATE youtube_song_countview ysc
+                    JOIN songs s ON ysc.song_id = s.song_id
+                    LEFT JOIN albums a ON s.album_id = a.album_id
+                    SET 
+                        ysc.song_name = s.name,
+                        ysc.album_name = a.name,
+                        ysc.album_id = s.album_id
+                    WHERE ysc.song_name IS NULL
+                """)
+                print(f"Updated {cursor.rowcount} rows in youtube_song_countview")
+
+                # Update youtubemsc_song_countview
+                cursor.execute("""
+                    UPDATE youtubemsc_song_countview ymsc
+                    JOIN songs s ON ymsc.song_id = s.song_id
+                    LEFT JOIN albums a ON s.album_id = a.album_id
+                    SET 
+                        ymsc.song_name = s.name,
+                        ymsc.album_name = a.name,
+                        ymsc.album_id = s.album_id
+                    WHERE ymsc.song_name IS NULL
+                """)
+                print(f"Updated {cursor.rowcount} rows in youtubemsc_song_countview")
+
+                connection.commit()
+                print("Countview data backfill completed successfully!")
+            except Exception as e:
+                connection.rollback()
+                print(f"Error backfilling countview data: {e}")
+                raise
+            finally:
+                cursor.close()
 
 if __name__ == "__main__":
-    etl_system = ETLSystem()
+    parser = argparse.ArgumentParser(description="Data flow ETL system")
+    parser.add_argument("--full", action="store_true",
+                        help="Recompute media kit data for every artist, not only the ones with new data")
+    args = parser.parse_args()
+
+    etl_system = ETLSystem(full_media_kit=args.full)
     etl_system.run()
\ No newline at end of file
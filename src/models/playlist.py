@@ -22,13 +22,17 @@ class Playlist:
         return None
 
     @staticmethod
-    def add_playlist_from_spotify(db, spotify_playlist_id, playlist_name=None):
+    def add_playlist_from_spotify(db, spotify_playlist_id, playlist_name=None, spotify_api=None):
         """
         Add a playlist to the database using data fetched from Spotify.
+        Pass spotify_api to reuse an open client; otherwise one is created and closed here.
         """
+        owned_api = None
         try:
+            if spotify_api is None:
+                spotify_api = owned_api = SpotifyAPI()
             # Fetch playlist data from Spotify
-            playlist_data = SpotifyAPI().fetch_playlist_data(spotify_playlist_id)
+            playlist_data = spotify_api.fetch_playlist_data(spotify_playlist_id)
 
             # Debug: Print the fetched playlist data
             print("Fetched Playlist Data:", playlist_data)
@@ -58,6 +62,9 @@ class Playlist:
             print("Playlist added successfully!")
         except Exception as e:
             print(f"Error adding playlist: {e}")
+        finally:
+            if owned_api is not None:
+                owned_api.close()
 
     @staticmethod
     def update_in_db(db, playlist_id, **kwargs):
@@ -244,6 +244,32 @@ class Song:
             logger.error(f"Error fetching songs by album: {e}")
             return []
 
+    @staticmethod
+    def get_countview_details(db, song_ids=None):
+        """Map song_id to the song name, album name and album_id denormalized into countview tables"""
+        if song_ids is not None and not song_ids:
+            return {}
+
+        try:
+            if not db.is_connected():
+                db.connect()
+
+            cursor = db.connection.cursor(dictionary=True)
+            query = """
+                SELECT s.song_id, s.name AS song_name, a.name AS album_name, s.album_id
+                FROM songs s
+                LEFT JOIN albums a ON s.album_id = a.album_id
+            """
+            params = ()
+            if song_ids is not None:
+                query += f" WHERE s.song_id IN ({', '.join(['%s'] * len(song_ids))})"
+                params = tuple(song_ids)
+            cursor.execute(query, params)
+            return {row.pop("song_id"): row for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error fetching song countview details: {e}")
+            return {}
+
     @staticmethod
     def exists(db, song_id=None, spotify_id=None, youtube_id=None):
         """Check if a song exists by ID, Spotify ID, or YouTube ID"""
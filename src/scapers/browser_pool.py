@@ -0,0 +1,119 @@
+import logging
+import queue
+import threading
+from selenium.common.exceptions import WebDriverException
+
+_WORKER_DONE = object()
+
+
+class BrowserPool:
+    def __init__(self, driver_factory, workers=2, max_restarts=3):
+        """
+        Run page fetches on several WebDriver instances in parallel.
+
+        Args:
+            driver_factory (callable): driver_factory(worker_id) returns a new WebDriver; called once per
+                worker and on every restart.
+            workers (int): Number of worker threads, each owning its own driver.
+            max_restarts (int): Driver restarts allowed per worker before the worker gives up.
+        """
+        self.driver_factory = driver_factory
+        self.workers = workers
+        self.max_restarts = max_restarts
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, fetch, items):
+        """
+        Fetch every item and yield (item, result) pairs as soon as each one completes.
+
+        Args:
+            fetch (callable): fetch(driver, item) -> result. A WebDriverException escaping
+                fetch is treated as a driver crash: the driver is restarted and the item is
+                retried once on a fresh driver.
+            items (iterable): Work items.
+
+        Yields:
+            tuple: (item, result), with result None for items that could not be fetched.
+        """
+        tasks = queue.Queue()
+        results = queue.Queue()
+        for item in items:
+            tasks.put(item)
+
+        crashed_items = set()
+        crashed_lock = threading.Lock()
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(worker_id, fetch, tasks, results, crashed_items, crashed_lock),
+                name=f"browser-worker-{worker_id}",
+                daemon=True
+            )
+            for worker_id in range(min(self.workers, tasks.qsize()))
+        ]
+        for thread in threads:
+            thread.start()
+
+        running = len(threads)
+        while running:
+            result = results.get()
+            if result is _WORKER_DONE:
+                running -= 1
+                continue
+            yield result
+
+        # Every worker gave up; report whatever is left as failed
+        while True:
+            try:
+                yield tasks.get_nowait(), None
+            except queue.Empty:
+                break
+
+    def _work(self, worker_id, fetch, tasks, results, crashed_items, crashed_lock):
+        """Worker loop: pull items, fetch them with this worker's driver, restart the driver on crashes."""
+        driver = None
+        restarts = 0
+        try:
+            while True:
+                try:
+                    item = tasks.get_nowait()
+                except queue.Empty:
+                    return
+
+                try:
+                    if driver is None:
+                        driver = self.driver_factory(worker_id)
+                    results.put((item, fetch(driver, item)))
+                except WebDriverException as e:
+                    self.logger.warning(f"Browser worker {worker_id} crashed on {item}: {e}")
+                    self._quit(driver)
+                    driver = None
+                    restarts += 1
+
+                    with crashed_lock:
+                        retry = item not in crashed_items
+                        crashed_items.add(item)
+                    if retry:
+                        tasks.put(item)
+                    else:
+                        results.put((item, None))
+
+                    if restarts > self.max_restarts:
+                        self.logger.error(f"Browser worker {worker_id} exceeded {self.max_restarts} restarts; stopping.")
+                        return
+                except Exception as e:
+                    self.logger.error(f"Browser worker {worker_id} failed on {item}: {e}")
+                    results.put((item, None))
+        finally:
+            try:
+                self._quit(driver)
+            finally:
+                results.put(_WORKER_DONE)
+
+    def _quit(self, driver):
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except Exception:
+            pass  # The browser may already be gone after a crash
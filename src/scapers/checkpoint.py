@@ -0,0 +1,163 @@
+import logging
+from src.database.db_setup import DBSetup
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeCheckpoint:
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, db_connector, job, snapshot_window_hours=24):
+        """
+        Persist the progress of a scrape run so a restarted run can pick up where it stopped.
+
+        Args:
+            db_connector: Database connector object.
+            job (str): Name of the scrape job, e.g. 'spotify_songs_countview'.
+            snapshot_window_hours (int): Unfinished runs younger than this are resumed, older
+                ones are abandoned, and items captured within this window are skipped.
+        """
+        self.db_connector = db_connector
+        self.job = job
+        self.snapshot_window_hours = snapshot_window_hours
+        self.run_id = None
+        self._tables_ready = False
+
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            if not self.db_connector.is_connected():
+                self.db_connector.connect()
+            DBSetup(self.db_connector).create_checkpoint_tables()
+            self._tables_ready = True
+
+    def start(self, total_items):
+        """
+        Resume the latest unfinished run of this job, or start a new one.
+
+        Args:
+            total_items (int): Number of items the run has to go through.
+
+        Returns:
+            bool: True if an earlier run is being resumed.
+        """
+        self._ensure_tables()
+        with self.db_connector.checkout() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("""
+                    UPDATE scrape_runs
+                    SET status = 'abandoned'
+                    WHERE job = %s AND status = 'running'
+                    AND started_at < NOW() - INTERVAL %s HOUR
+                """, (self.job, self.snapshot_window_hours))
+                cursor.execute("""
+                    SELECT run_id, processed_items, last_item_id
+                    FROM scrape_runs
+                    WHERE job = %s AND status = 'running'
+                    ORDER BY run_id DESC
+                    LIMIT 1
+                """, (self.job,))
+                row = cursor.fetchone()
+                if row is not None:
+                    self.run_id, processed_items, last_item_id = row
+                    cursor.execute("UPDATE scrape_runs SET total_items = %s WHERE run_id = %s",
+                                   (total_items, self.run_id))
+                    logger.info(f"Resuming {self.job} run {self.run_id} after {processed_items} items "
+                                f"(last item {last_item_id}).")
+                else:
+                    cursor.execute("INSERT INTO scrape_runs (job, total_items) VALUES (%s, %s)",
+                                   (self.job, total_items))
+                    self.run_id = cursor.lastrowid
+                    logger.info(f"Started {self.job} run {self.run_id} for {total_items} items.")
+                connection.commit()
+                return row is not None
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def completed_items(self):
+        """
+        Return the IDs of items this run already finished.
+        """
+        with self.db_connector.checkout() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT item_id FROM scrape_run_items WHERE run_id = %s AND status = %s",
+                               (self.run_id, self.DONE))
+                return {item_id for (item_id,) in cursor.fetchall()}
+            finally:
+                cursor.close()
+
+    def recently_captured(self, table, id_column, time_column):
+        """
+        Return the IDs that already have a row in table captured within the snapshot window.
+
+        Args:
+            table (str): Table the scraper writes to, e.g. 'spotify_song_countview'.
+            id_column (str): Column holding the item ID.
+            time_column (str): Column holding the capture time.
+        """
+        with self.db_connector.checkout() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT DISTINCT {id_column}
+                    FROM {table}
+                    WHERE {time_column} >= NOW() - INTERVAL %s HOUR
+                """, (self.snapshot_window_hours,))
+                return {item_id for (item_id,) in cursor.fetchall()}
+            finally:
+                cursor.close()
+
+    def mark(self, item_ids, status=DONE, connection=None):
+        """
+        Record the status of processed items and advance the run's progress.
+
+        Args:
+            item_ids (list): IDs of the processed items, in processing order.
+            status (str): ScrapeCheckpoint.DONE or ScrapeCheckpoint.FAILED.
+            connection: Connection whose transaction the update should join. The caller
+                commits it. Without one, the update is committed on its own connection.
+        """
+        item_ids = list(item_ids)
+        if not item_ids or self.run_id is None:
+            return
+        if connection is None:
+            with self.db_connector.checkout() as connection:
+                self.mark(item_ids, status, connection)
+                connection.commit()
+            return
+
+        rows = [{"run_id": self.run_id, "item_id": item_id, "status": status} for item_id in item_ids]
+        self.db_connector.upsert_many("scrape_run_items", rows, update_columns=["status"],
+                                      commit=False, connection=connection)
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE scrape_runs
+                SET processed_items = processed_items + %s, last_item_id = %s
+                WHERE run_id = %s
+            """, (len(item_ids), item_ids[-1], self.run_id))
+        finally:
+            cursor.close()
+
+    def finish(self):
+        """
+        Mark the run as finished so the next run starts from scratch.
+        """
+        if self.run_id is None:
+            return
+        with self.db_connector.checkout() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("""
+                    UPDATE scrape_runs SET status = 'finished', finished_at = NOW()
+                    WHERE run_id = %s
+                """, (self.run_id,))
+                connection.commit()
+                logger.info(f"Finished {self.job} run {self.run_id}.")
+            finally:
+                cursor.close()
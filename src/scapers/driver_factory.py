@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import tempfile
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger(__name__)
+
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH', '/usr/bin/chromedriver')
+PROFILE_ROOT = os.getenv('SCRAPER_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'data_flow_chrome_profiles'))
+
+# Requests the scrapers never need: images, fonts, media, analytics and ads
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp3", "*.mp4", "*.m4a", "*.webm",
+    "*i.scdn.co*", "*mosaic.scdn.co*", "*image-cdn*", "*audio-ak*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*googleadservices.com*", "*facebook.net*",
+    "*hotjar.com*", "*sentry.io*", "*adeventtracker*", "*pixel.spotify.com*",
+]
+
+
+def create_driver(profile_name=None, block_resources=True, track_bandwidth=True):
+    """
+    Create a lean headless Chrome WebDriver for scraping.
+
+    Args:
+        profile_name (str): Name of a persistent profile directory under SCRAPER_PROFILE_DIR.
+            Reusing it keeps cookies, consent banners and the HTTP cache warm between runs.
+            Each concurrently running browser needs its own name. None uses a throwaway profile.
+        block_resources (bool): Block images, fonts, media, analytics and ad requests through DevTools.
+        track_bandwidth (bool): Record network events so page_bytes() can report bytes per page.
+
+    Returns:
+        WebDriver: The configured Chrome driver.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    chrome_options.page_load_strategy = 'eager'
+
+    if profile_name:
+        profile_dir = os.path.join(PROFILE_ROOT, profile_name)
+        os.makedirs(profile_dir, exist_ok=True)
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+    if track_bandwidth:
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    service = Service(executable_path=CHROMEDRIVER_PATH)
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+
+    if block_resources:
+        apply_resource_blocking(driver)
+    return driver
+
+
+def apply_resource_blocking(driver):
+    """
+    Block BLOCKED_URL_PATTERNS in the tab the driver is currently switched to.
+
+    DevTools commands only reach the current target, so every tab opened with window.open
+    needs this before it navigates.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+
+def page_bytes(driver):
+    """
+    Return the number of bytes the browser received since the last call, or None if the
+    driver was created without track_bandwidth.
+    """
+    try:
+        entries = driver.get_log("performance")
+    except WebDriverException:
+        return None
+
+    total = 0
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if message.get("method") == "Network.loadingFinished":
+            total += int(message.get("params", {}).get("encodedDataLength", 0))
+    return total
+
+
+def format_bytes(size):
+    """Format a byte count from page_bytes() for log messages."""
+    if size is None:
+        return "size unknown"
+    return f"{size / 1024:.0f} KiB"
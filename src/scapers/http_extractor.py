@@ -0,0 +1,209 @@
+import base64
+import binascii
+import json
+import logging
+import re
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from src.scapers.scrape_errors import PermanentFailure
+
+logger = logging.getLogger(__name__)
+
+# Matches "1,234,567 monthly listeners" / "1.234.567 ouvintes mensais" but not abbreviated "1.2M"
+_LISTENERS_TEXT = re.compile(r'(\d{1,3}(?:[.,\s]\d{3})*|\d+)\s+(?:monthly listeners|ouvintes mensais)', re.IGNORECASE)
+# Spotify ID of the track or artist a page URL points to
+_PAGE_ID = re.compile(r'/(track|artist)/([A-Za-z0-9]+)')
+
+
+def _to_int(text):
+    """Turn a formatted number such as '1.234.567' into an int, or None if it has no digits."""
+    digits = re.sub(r'\D', '', str(text))
+    return int(digits) if digits else None
+
+
+def _find_entities(data, uri):
+    """
+    Yield every object describing the entity with the given Spotify URI, e.g. 'spotify:track:<id>',
+    either stored under that URI as a key or carrying it in its "uri" field.
+    """
+    if isinstance(data, dict):
+        if data.get("uri") == uri:
+            yield data
+        for key, value in data.items():
+            if key == uri and isinstance(value, dict):
+                yield value
+            yield from _find_entities(value, uri)
+    elif isinstance(data, list):
+        for item in data:
+            yield from _find_entities(item, uri)
+
+
+def _entity_values(entity, keys, uri):
+    """
+    Yield the values stored under one of keys inside an entity, without descending into
+    nested objects that describe other entities (albums, related tracks, artists).
+    """
+    if isinstance(entity, dict):
+        if entity.get("uri") not in (None, uri):
+            return
+        for key, value in entity.items():
+            if key in keys and isinstance(value, (int, str)):
+                yield value
+            else:
+                yield from _entity_values(value, keys, uri)
+    elif isinstance(entity, list):
+        for item in entity:
+            yield from _entity_values(item, keys, uri)
+
+
+def page_id(url):
+    """Return the Spotify ID in a track or artist page URL, or None."""
+    match = _PAGE_ID.search(url or "")
+    return match.group(2) if match else None
+
+
+class SpotifyPageExtractor:
+    USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+
+    def __init__(self, timeout=10, pool_size=8):
+        """
+        Read play counts and monthly listeners from Spotify pages over plain HTTP.
+
+        Pages are fetched with a pooled keep-alive session and parsed for the numbers
+        rendered in the markup or embedded in the page's initial-state JSON. Every
+        method returns None when the number cannot be found, so callers can fall
+        back to a full browser.
+
+        Args:
+            timeout (int): Seconds to wait for each response.
+            pool_size (int): Maximum number of kept-alive connections.
+        """
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": self.USER_AGENT,
+            "Accept-Language": "en-US,en;q=0.9",
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _fetch_html(self, url):
+        """
+        Return the page body, or None on network errors and non-200 responses.
+        Raises PermanentFailure if the page does not exist (404/410).
+        """
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"HTTP fetch failed for {url}: {e}")
+            return None
+        if response.status_code in (404, 410):
+            raise PermanentFailure(f"{url} returned {response.status_code}")
+        if response.status_code != 200:
+            logger.warning(f"HTTP fetch for {url} returned {response.status_code}")
+            return None
+        return response.text
+
+    @staticmethod
+    def _embedded_json(soup):
+        """Yield every JSON document embedded in the page's script tags."""
+        for script in soup.find_all("script"):
+            text = script.string
+            if not text:
+                continue
+            text = text.strip()
+            if script.get("id") == "initial-state":
+                try:
+                    text = base64.b64decode(text).decode("utf-8")
+                except (binascii.Error, UnicodeDecodeError):
+                    continue
+            elif script.get("type") not in ("application/json", "application/ld+json") \
+                    and script.get("id") != "__NEXT_DATA__":
+                continue
+            try:
+                yield json.loads(text)
+            except ValueError:
+                continue
+
+    @classmethod
+    def _entity_number(cls, soup, uri, keys):
+        """Return the first number stored under keys for the entity with uri in the embedded JSON."""
+        for data in cls._embedded_json(soup):
+            for entity in _find_entities(data, uri):
+                for value in _entity_values(entity, keys, uri):
+                    number = _to_int(value)
+                    if number is not None:
+                        return number
+        return None
+
+    @classmethod
+    def parse_playcount(cls, html, track_id=None):
+        """
+        Extract a track's play count from its page HTML.
+
+        The embedded JSON is only searched for the entry of track_id, since track pages also
+        embed the album tracklist and recommendations with their own play counts.
+
+        Args:
+            html (str): Page HTML.
+            track_id (str): Spotify ID of the track. Without it only the rendered markup is read.
+
+        Returns:
+            int: Play count, or None if the page does not contain one.
+        """
+        soup = BeautifulSoup(html, "lxml")
+        span = soup.select_one('span[data-testid="playcount"]')
+        if span is not None and _to_int(span.get_text()) is not None:
+            return _to_int(span.get_text())
+
+        if track_id is None:
+            return None
+        return cls._entity_number(soup, f"spotify:track:{track_id}", ("playcount", "playCount"))
+
+    @classmethod
+    def parse_monthly_listeners(cls, html, artist_id=None):
+        """
+        Extract an artist's monthly listeners from their page HTML.
+
+        Args:
+            html (str): Page HTML.
+            artist_id (str): Spotify ID of the artist. Without it the embedded JSON is not
+                searched, since it also holds related artists.
+
+        Returns:
+            int: Monthly listeners, or None if the page does not contain them.
+        """
+        soup = BeautifulSoup(html, "lxml")
+        span = soup.select_one("span.Ydwa1P5GkCggtLlSvphs")
+        if span is not None and span.get_text().strip():
+            listeners = _to_int(span.get_text().split()[0])
+            if listeners is not None:
+                return listeners
+
+        if artist_id is not None:
+            listeners = cls._entity_number(soup, f"spotify:artist:{artist_id}", ("monthlyListeners",))
+            if listeners is not None:
+                return listeners
+
+        for meta in soup.find_all("meta", attrs={"content": True}):
+            if meta.get("property") == "og:description" or meta.get("name") == "description":
+                match = _LISTENERS_TEXT.search(meta["content"])
+                if match:
+                    return _to_int(match.group(1))
+        return None
+
+    def fetch_playcount(self, url):
+        """Fetch a track page and return its play count, or None. Raises PermanentFailure for missing pages."""
+        html = self._fetch_html(url)
+        return self.parse_playcount(html, page_id(url)) if html else None
+
+    def fetch_monthly_listeners(self, url):
+        """Fetch an artist page and return its monthly listeners, or None. Raises PermanentFailure for missing pages."""
+        html = self._fetch_html(url)
+        return self.parse_monthly_listeners(html, page_id(url)) if html else None
+
+    def close(self):
+        self.session.close()
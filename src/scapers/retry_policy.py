@@ -0,0 +1,70 @@
+import logging
+import random
+import time
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from src.scapers.scrape_errors import PermanentFailure, RetriesExhausted
+
+logger = logging.getLogger(__name__)
+
+# Titles Spotify serves for removed or unknown tracks and artists
+MISSING_PAGE_TITLES = ("page not found", "página não encontrada")
+
+
+def is_missing_page(title):
+    """Return True if a page title says the requested Spotify page does not exist."""
+    title = (title or "").lower()
+    return any(missing in title for missing in MISSING_PAGE_TITLES)
+
+
+class RetryPolicy:
+    RETRYABLE = (TimeoutException, NoSuchElementException, StaleElementReferenceException, ValueError)
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=16.0, max_elapsed=45.0, jitter=0.5,
+                 retryable=RETRYABLE):
+        """
+        Retry a call with exponential backoff and jitter.
+
+        Args:
+            max_attempts (int): Total number of attempts, including the first one.
+            base_delay (float): Seconds to wait after the first failure; doubled after each further failure.
+            max_delay (float): Upper bound for a single wait.
+            max_elapsed (float): Stop retrying once this many seconds have passed since the first attempt.
+            jitter (float): Fraction of each wait that is randomised, so parallel workers do not retry in lockstep.
+            retryable (tuple): Exception types worth retrying. PermanentFailure and anything else propagate at once.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.jitter = jitter
+        self.retryable = retryable
+
+    def backoff(self, attempt):
+        """Return the seconds to wait after the given failed attempt (1-based)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    def run(self, func, *args, description=None, **kwargs):
+        """
+        Call func(*args, **kwargs) until it succeeds.
+
+        Raises:
+            PermanentFailure: As soon as func raises it.
+            RetriesExhausted: When the attempts or the elapsed-time budget run out.
+        """
+        description = description or getattr(func, "__name__", "call")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except PermanentFailure:
+                raise
+            except self.retryable as e:
+                delay = self.backoff(attempt)
+                elapsed = time.monotonic() - started
+                if attempt >= self.max_attempts or elapsed + delay > self.max_elapsed:
+                    raise RetriesExhausted(attempt, e) from e
+                logger.warning(f"Retrying {description} in {delay:.1f}s (attempt {attempt + 1}/{self.max_attempts})")
+                time.sleep(delay)
@@ -0,0 +1,11 @@
+class PermanentFailure(Exception):
+    """Raised by a fetch when retrying cannot help, e.g. the page returned 404 or the track was removed."""
+
+
+class RetriesExhausted(Exception):
+    """Raised when every attempt allowed by a RetryPolicy failed with a retryable error."""
+
+    def __init__(self, attempts, last_error):
+        super().__init__(f"gave up after {attempts} attempts: {last_error}")
+        self.attempts = attempts
+        self.last_error = last_error
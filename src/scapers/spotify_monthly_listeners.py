@@ -1,38 +1,68 @@
 import logging
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import (
+    TimeoutException, NoSuchElementException, StaleElementReferenceException, WebDriverException
+)
+from src.scapers.checkpoint import ScrapeCheckpoint
+from src.scapers.driver_factory import apply_resource_blocking, create_driver, format_bytes, page_bytes
+from src.scapers.http_extractor import SpotifyPageExtractor
+from src.scapers.retry_policy import RetryPolicy, is_missing_page
+from src.scapers.scrape_errors import PermanentFailure, RetriesExhausted
 
 
 class MonthlyListeners:
-    def __init__(self, db_connector, batch_size=3, max_retries=20):
+    def __init__(self, db_connector, batch_size=3, max_retries=20, use_http=True, http_workers=8,
+                 retry_policy=None, snapshot_window_hours=24):
         """
         Initialize the MonthlyListeners class.
 
         Args:
             db_connector: Database connector object.
-            batch_size (int): Number of tabs to open at a time. Default is 2.
-            max_retries (int): Maximum number of retries for failed fetches. Default is 3.
+            batch_size (int): Number of tabs to open at a time. Default is 3.
+            max_retries (int): Maximum number of retries per URL before it is deferred to the end
+                of the run. Default is 20. Ignored when retry_policy is given.
+            use_http (bool): Read listeners over plain HTTP first and only load pages
+                in a browser when that fails. Default is True.
+            http_workers (int): Number of concurrent HTTP requests. Default is 8.
+            retry_policy (RetryPolicy): Backoff policy for browser fetches.
+            snapshot_window_hours (int): Artists captured within this many hours are skipped, and an
+                interrupted run younger than this is resumed. Default is 24.
         """
         self.db_connector = db_connector
         self.batch_size = batch_size
         self.max_retries = max_retries
-        self.driver = self._setup_driver()
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries + 1)
+        self.snapshot_window_hours = snapshot_window_hours
+        self.http_workers = http_workers
+        self.http_extractor = SpotifyPageExtractor(pool_size=http_workers) if use_http else None
+        self._driver = None
         self.logger = self._setup_logger()
 
+    @property
+    def driver(self):
+        """The WebDriver used for browser fallbacks, started on first use."""
+        if self._driver is None:
+            self._driver = self._setup_driver()
+        return self._driver
+
+    def _quit_driver(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+    def close(self):
+        """Quit the browser, if one was started, and release the HTTP connections."""
+        self._quit_driver()
+        if self.http_extractor is not None:
+            self.http_extractor.close()
+
     @staticmethod
-    def _setup_driver():
-        """Set up and return a headless Chrome WebDriver."""
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.page_load_strategy = 'eager'
-        service = Service(executable_path='/usr/bin/chromedriver')
-        return webdriver.Chrome(service=service, options=chrome_options)
+    def _setup_driver(worker_id=0):
+        """Set up and return a lean headless Chrome WebDriver with its own warm profile."""
+        return create_driver(profile_name=f"monthly-listeners-{worker_id}")
 
     @staticmethod
     def _setup_logger():
@@ -41,35 +71,102 @@ class MonthlyListeners:
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         return logger
 
-    def _fetch_listeners_from_url(self, spotify_url, retries=0):
+    @staticmethod
+    def _read_listeners(driver):
+        """Wait for the monthly listeners on the page loaded in the current tab and return them."""
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, 'span.Ydwa1P5GkCggtLlSvphs'))
+        )
+        listeners_span = driver.find_element(By.CSS_SELECTOR, 'span.Ydwa1P5GkCggtLlSvphs')
+        listeners_text = listeners_span.text.strip()
+        return int(listeners_text.split()[0].replace('.', '').replace(' ', ''))
+
+    def _fetch_listeners_in_tabs(self, spotify_urls):
         """
-        Fetch monthly listeners from a single Spotify URL.
+        Load several artist pages at once, one tab each, and read the listeners from every tab.
+
+        Each tab is opened blank, gets resource blocking applied, and is then pointed at its URL
+        without waiting for the load, so the pages all load in parallel; by the time the first
+        tab has rendered, the others are usually ready too.
+
+        Args:
+            spotify_urls (list): Spotify artist URLs.
+
+        Returns:
+            list: Listeners per URL in the same order, with None for tabs that did not render them.
+        """
+        driver = self.driver
+        original_handle = driver.current_window_handle
+        tabs = []
+        try:
+            for spotify_url in spotify_urls:
+                known_handles = set(driver.window_handles)
+                driver.execute_script("window.open('about:blank', '_blank');")
+                new_handles = [handle for handle in driver.window_handles if handle not in known_handles]
+                handle = new_handles[0] if new_handles else None
+                tabs.append(handle)
+                if handle is not None:
+                    driver.switch_to.window(handle)
+                    apply_resource_blocking(driver)
+                    driver.execute_script("window.location.href = arguments[0];", spotify_url)
+
+            results = []
+            for spotify_url, handle in zip(spotify_urls, tabs):
+                listeners = None
+                if handle is not None:
+                    try:
+                        driver.switch_to.window(handle)
+                        listeners = self._read_listeners(driver)
+                        self.logger.info(f"Fetched {listeners} listeners from {spotify_url}")
+                    except (TimeoutException, NoSuchElementException, StaleElementReferenceException, ValueError) as e:
+                        self.logger.warning(f"Tab for {spotify_url} did not render listeners: {e}")
+                results.append(listeners)
+            self.logger.info(f"Loaded {len(spotify_urls)} tabs ({format_bytes(page_bytes(driver))})")
+            return results
+        finally:
+            for handle in tabs:
+                if handle is None:
+                    continue
+                try:
+                    driver.switch_to.window(handle)
+                    driver.close()
+                except WebDriverException:
+                    pass  # Tab already gone
+            driver.switch_to.window(original_handle)
+
+    def _load_listeners(self, spotify_url):
+        """
+        Load an artist page once and read its monthly listeners.
+        Raises PermanentFailure if Spotify says the artist does not exist.
+        """
+        self.driver.get(spotify_url)
+        try:
+            return self._read_listeners(self.driver)
+        except TimeoutException:
+            if is_missing_page(self.driver.title):
+                raise PermanentFailure(f"{spotify_url} no longer exists")
+            raise
+
+    def _fetch_listeners_from_url(self, spotify_url):
+        """
+        Fetch monthly listeners from a single Spotify URL, retrying with backoff.
 
         Args:
             spotify_url (str): Spotify artist URL.
-            retries (int): Current retry attempt.
 
         Returns:
-            int: Number of monthly listeners, or None if fetching fails after max retries.
+            int: Number of monthly listeners, or None if the artist page no longer exists.
+
+        Raises:
+            RetriesExhausted: If the page kept failing with retryable errors.
         """
         try:
-            self.driver.get(spotify_url)
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'span.Ydwa1P5GkCggtLlSvphs'))
-            )
-            listeners_span = self.driver.find_element(By.CSS_SELECTOR, 'span.Ydwa1P5GkCggtLlSvphs')
-            listeners_text = listeners_span.text.strip()
-            listeners = int(listeners_text.split()[0].replace('.', '').replace(' ', ''))
-            self.logger.info(f"Fetched {listeners} listeners from {spotify_url}")
-            return listeners
-        except (TimeoutException, NoSuchElementException, StaleElementReferenceException) as e:
-            if retries < self.max_retries:
-                self.logger.warning(f"Retrying {spotify_url} (Attempt {retries + 1}/{self.max_retries})")
-                time.sleep(5)  # Wait before retrying
-                return self._fetch_listeners_from_url(spotify_url, retries + 1)
-            else:
-                self.logger.error(f"Failed to fetch listeners from {spotify_url} after {self.max_retries} retries: {e}")
-                return None
+            listeners = self.retry_policy.run(self._load_listeners, spotify_url, description=spotify_url)
+        except PermanentFailure as e:
+            self.logger.warning(f"Skipping {spotify_url}: {e}")
+            return None
+        self.logger.info(f"Fetched {listeners} listeners from {spotify_url} ({format_bytes(page_bytes(self.driver))})")
+        return listeners
 
     def _get_artists_with_spotify_id(self):
         """
@@ -78,69 +175,167 @@ class MonthlyListeners:
         Returns:
             list: List of tuples containing artist_id and spotify_id.
         """
-        connection = self.db_connector.connect()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("""
-                SELECT artist_id, spotify_id 
-                FROM artists 
-                WHERE spotify_id IS NOT NULL 
-                ORDER BY artist_id
-            """)
-            return cursor.fetchall()
-        except Exception as e:
-            self.logger.error(f"Error fetching artists from the database: {e}")
-            return []
-        finally:
-            cursor.close()
-            connection.close()
+        with self.db_connector.checkout() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("""
+                    SELECT artist_id, spotify_id 
+                    FROM artists 
+                    WHERE spotify_id IS NOT NULL 
+                    ORDER BY artist_id
+                """)
+                return cursor.fetchall()
+            except Exception as e:
+                self.logger.error(f"Error fetching artists from the database: {e}")
+                return []
+            finally:
+                cursor.close()
 
-    def _save_listeners_to_db(self, artist_id, listeners):
+    def _save_listeners_batch_to_db(self, listeners_by_artist, checkpoint=None):
         """
-        Save monthly listeners to the database.
+        Save monthly listeners for several artists in one multi-row insert.
 
         Args:
-            artist_id (int): Artist ID in the database.
-            listeners (int): Number of monthly listeners.
+            listeners_by_artist (dict): Mapping of artist ID to number of monthly listeners.
+            checkpoint (ScrapeCheckpoint): Run checkpoint to mark the artists done in the same transaction.
         """
-        if isinstance(listeners, int):
-            connection = self.db_connector.connect()
-            cursor = connection.cursor()
+        rows = [
+            {"artist_id": artist_id, "listeners": listeners}
+            for artist_id, listeners in listeners_by_artist.items()
+            if isinstance(listeners, int)
+        ]
+        if not rows:
+            return
+        with self.db_connector.checkout() as connection:
             try:
-                query = """
-                    INSERT INTO monthly_listeners (artist_id, listeners)
-                    VALUES (%s, %s)
-                """
-                cursor.execute(query, (artist_id, listeners))
+                self.db_connector.insert_many("monthly_listeners", rows, commit=False, connection=connection)
+                if checkpoint is not None:
+                    checkpoint.mark([row["artist_id"] for row in rows], connection=connection)
                 connection.commit()
-                self.logger.info(f"Saved {listeners} listeners for artist ID {artist_id}")
+                self.logger.info(f"Saved listeners for {len(rows)} artists")
             except Exception as e:
-                self.logger.error(f"Error saving listeners for artist ID {artist_id}: {e}")
+                self.logger.error(f"Error saving listeners for artists {list(listeners_by_artist)}: {e}")
                 connection.rollback()
-            finally:
-                cursor.close()
-                connection.close()
-        else:
-            self.logger.warning(f"Invalid listeners data for artist ID {artist_id}: {listeners}")
 
-    def update_all_artists(self):
+    def update_all_artists(self, artist_ids=None):
         """
         Update monthly listeners for all artists in the database.
+
+        Progress is checkpointed, so a run that crashed or was restarted resumes with the artists
+        it had not saved yet. Artists captured within the snapshot window are skipped.
+
+        Args:
+            artist_ids (iterable): Only update these artists, e.g. as picked by RefreshScheduler.
+                They are refreshed even if they were captured within the snapshot window.
         """
         artists = self._get_artists_with_spotify_id()
+        if artist_ids is not None:
+            wanted = set(artist_ids)
+            artists = [artist for artist in artists if artist[0] in wanted]
         if not artists:
             self.logger.warning("No artists with Spotify IDs found in the database.")
             return
 
-        for i in range(0, len(artists), self.batch_size):
-            batch = artists[i:i + self.batch_size]
-            artist_ids = [artist_id for artist_id, _ in batch]
-            artist_urls = [f"https://open.spotify.com/artist/{spotify_id}" for _, spotify_id in batch]
+        job = "spotify_monthly_listeners" if artist_ids is None else "spotify_monthly_listeners_scheduled"
+        checkpoint = ScrapeCheckpoint(self.db_connector, job, self.snapshot_window_hours)
+        checkpoint.start(len(artists))
+        captured = checkpoint.completed_items()
+        if artist_ids is None:
+            captured |= checkpoint.recently_captured("monthly_listeners", "artist_id", "fetched_at")
+        remaining_ids = [artist_id for artist_id, _ in artists if artist_id not in captured]
+        if len(remaining_ids) < len(artists):
+            self.logger.info(f"Skipping {len(artists) - len(remaining_ids)} artists already captured; "
+                             f"{len(remaining_ids)} left.")
+        artists = [artist for artist in artists if artist[0] not in captured]
+
+        if self.http_extractor is not None:
+            artists = self._update_artists_over_http(artists, checkpoint)
+            if artists:
+                self.logger.info(f"Falling back to the browser for {len(artists)} artists")
+
+        deferred = []
+        try:
+            for i in range(0, len(artists), self.batch_size):
+                batch = artists[i:i + self.batch_size]
+                batch_ids = [artist_id for artist_id, _ in batch]
+                artist_urls = [f"https://open.spotify.com/artist/{spotify_id}" for _, spotify_id in batch]
+
+                listeners_by_artist = {}
+                tab_results = self._fetch_listeners_in_tabs(artist_urls)
+                for artist_id, spotify_url, listeners in zip(batch_ids, artist_urls, tab_results):
+                    if listeners is None:
+                        # Retry tabs that failed on their own, with the usual retry loop
+                        try:
+                            listeners = self._fetch_listeners_from_url(spotify_url)
+                        except RetriesExhausted as e:
+                            self.logger.warning(f"Deferring {spotify_url} to the end of the run: {e}")
+                            deferred.append((artist_id, spotify_url))
+                    if listeners is not None:
+                        listeners_by_artist[artist_id] = listeners
+                self._save_listeners_batch_to_db(listeners_by_artist, checkpoint)
+
+            if deferred:
+                self.logger.info(f"Retrying {len(deferred)} deferred artists")
+                self._save_listeners_batch_to_db(self._fetch_deferred(deferred), checkpoint)
+
+            completed = checkpoint.completed_items()
+            checkpoint.mark([artist_id for artist_id in remaining_ids if artist_id not in completed],
+                            ScrapeCheckpoint.FAILED)
+            checkpoint.finish()
+        finally:
+            self._quit_driver()
+        self.logger.info("Finished updating monthly listeners for all artists.")
+
+    def _fetch_deferred(self, deferred):
+        """
+        Give artists that ran out of retries one last round.
+
+        Args:
+            deferred (list): Tuples of (artist_id, spotify_url).
 
-            for artist_id, spotify_url in zip(artist_ids, artist_urls):
+        Returns:
+            dict: Mapping of artist ID to monthly listeners for the ones that succeeded.
+        """
+        listeners_by_artist = {}
+        for artist_id, spotify_url in deferred:
+            try:
                 listeners = self._fetch_listeners_from_url(spotify_url)
-                if listeners is not None:
-                    self._save_listeners_to_db(artist_id, listeners)
+            except RetriesExhausted as e:
+                self.logger.error(f"Failed to fetch listeners from {spotify_url}: {e}")
+                continue
+            if listeners is not None:
+                listeners_by_artist[artist_id] = listeners
+        return listeners_by_artist
+
+    def _update_artists_over_http(self, artists, checkpoint=None):
+        """
+        Fetch and save monthly listeners without a browser.
+
+        Args:
+            artists (list): Tuples of (artist_id, spotify_id).
+            checkpoint (ScrapeCheckpoint): Run checkpoint to record the saved artists in.
+
+        Returns:
+            list: The artists whose pages could not be parsed, excluding pages that no longer exist.
+        """
+        def fetch(spotify_url):
+            try:
+                return self.http_extractor.fetch_monthly_listeners(spotify_url), False
+            except PermanentFailure as e:
+                self.logger.warning(f"Skipping {spotify_url}: {e}")
+                return None, True
 
-        self.driver.quit()
-        self.logger.info("Finished updating monthly listeners for all artists.")
\ No newline at end of file
+        failures = []
+        listeners_by_artist = {}
+        with ThreadPoolExecutor(max_workers=self.http_workers) as executor:
+            urls = [f"https://open.spotify.com/artist/{spotify_id}" for _, spotify_id in artists]
+            for artist, (listeners, missing) in zip(artists, executor.map(fetch, urls)):
+                if missing:
+                    continue
+                if listeners is None:
+                    failures.append(artist)
+                else:
+                    self.logger.info(f"Fetched {listeners} listeners for artist ID {artist[0]} over HTTP")
+                    listeners_by_artist[artist[0]] = listeners
+        self._save_listeners_batch_to_db(listeners_by_artist, checkpoint)
+        return failures
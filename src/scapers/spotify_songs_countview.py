@@ -1,43 +1,72 @@
 import logging
 import re
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+from src.database.countview_latest import CountviewLatest
+from src.models.song import Song
+from src.scapers.browser_pool import BrowserPool
+from src.scapers.checkpoint import ScrapeCheckpoint
+from src.scapers.driver_factory import create_driver, format_bytes, page_bytes
+from src.scapers.http_extractor import SpotifyPageExtractor
+from src.scapers.retry_policy import RetryPolicy, is_missing_page
+from src.scapers.scrape_errors import PermanentFailure, RetriesExhausted
 
 
 class SpotifySongsCountView:
-    def __init__(self, db_connector, batch_size=3, max_retries=20):
+    def __init__(self, db_connector, batch_size=3, max_retries=20, workers=1, use_http=True, http_workers=8,
+                 retry_policy=None, snapshot_window_hours=24):
         """
         Initialize the SpotifySongsCountView class.
 
         Args:
             db_connector: Database connector object.
-            batch_size (int): Number of URLs to process in a batch. Default is 3.
-            max_retries (int): Maximum number of retries for failed fetches. Default is 3.
+            batch_size (int): Number of play counts written to the database per insert. Default is 3.
+            max_retries (int): Maximum number of retries per URL before it is deferred to the end
+                of the run. Default is 20. Ignored when retry_policy is given.
+            workers (int): Number of headless browsers scraping in parallel. Default is 1.
+            use_http (bool): Read play counts over plain HTTP first and only load pages
+                in a browser when that fails. Default is True.
+            http_workers (int): Number of concurrent HTTP requests. Default is 8.
+            retry_policy (RetryPolicy): Backoff policy for browser fetches.
+            snapshot_window_hours (int): Songs captured within this many hours are skipped, and an
+                interrupted run younger than this is resumed. Default is 24.
         """
         self.db_connector = db_connector
         self.batch_size = batch_size
         self.max_retries = max_retries
-        self.driver = self._setup_driver()
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries + 1)
+        self.snapshot_window_hours = snapshot_window_hours
+        self.workers = workers
+        self.http_workers = http_workers
+        self.http_extractor = SpotifyPageExtractor(pool_size=http_workers) if use_http else None
+        self._driver = None
         self.logger = self._setup_logger()
 
+    @property
+    def driver(self):
+        """The WebDriver used for single-worker scraping, started on first use."""
+        if self._driver is None:
+            self._driver = self._setup_driver()
+        return self._driver
+
+    def _quit_driver(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+    def close(self):
+        """Quit the browser, if one was started, and release the HTTP connections."""
+        self._quit_driver()
+        if self.http_extractor is not None:
+            self.http_extractor.close()
+
     @staticmethod
-    def _setup_driver():
-        """Set up and return a headless Chrome WebDriver."""
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.page_load_strategy = 'eager'
-        chrome_options.add_argument('--disable-images')
-        chrome_options.add_argument('--disable-javascript')
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        service = Service(executable_path='/usr/bin/chromedriver')
-        return webdriver.Chrome(service=service, options=chrome_options)
+    def _setup_driver(worker_id=0):
+        """Set up and return a lean headless Chrome WebDriver with its own warm profile."""
+        return create_driver(profile_name=f"songs-countview-{worker_id}")
 
     @staticmethod
     def _setup_logger():
@@ -46,91 +75,157 @@ class SpotifySongsCountView:
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         return logger
 
-    def _fetch_countview_from_url(self, url, retries=0):
+    @staticmethod
+    def _load_countview(driver, url):
         """
-        Fetch the play count from a single Spotify song URL.
+        Load a song page once and read its play count.
+        Raises PermanentFailure if Spotify says the track does not exist.
+        """
+        driver.get(url)
+        try:
+            WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, 'title')))
+            play_count_element = WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-testid="playcount"]'))
+            )
+        except TimeoutException:
+            if is_missing_page(driver.title):
+                raise PermanentFailure(f"{url} no longer exists")
+            raise
+        play_count_digits = re.findall(r'\d+', play_count_element.text)
+        return int(''.join(play_count_digits))
+
+    def _fetch_countview_from_url(self, url, driver=None):
+        """
+        Fetch the play count from a single Spotify song URL, retrying with backoff.
 
         Args:
             url (str): Spotify song URL.
-            retries (int): Current retry attempt.
+            driver: WebDriver to load the page with. Defaults to this instance's driver.
 
         Returns:
-            int: Play count, or None if fetching fails after max retries.
+            int: Play count, or None if the track no longer exists.
+
+        Raises:
+            RetriesExhausted: If the page kept failing with retryable errors.
         """
+        driver = driver or self.driver
         try:
-            self.driver.get(url)
-            WebDriverWait(self.driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, 'title')))
-            play_count_element = WebDriverWait(self.driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-testid="playcount"]'))
-            )
-            play_count_text = play_count_element.text
-            play_count_digits = re.findall(r'\d+', play_count_text)
-            play_count = int(''.join(play_count_digits))
-            self.logger.info(f"Fetched {play_count} streams from {url}")
-            return play_count
-        except (TimeoutException, NoSuchElementException, StaleElementReferenceException) as e:
-            if retries < self.max_retries:
-                self.logger.warning(f"Retrying {url} (Attempt {retries + 1}/{self.max_retries})")
-                time.sleep(5)  # Wait before retrying
-                return self._fetch_countview_from_url(url, retries + 1)
+            play_count = self.retry_policy.run(self._load_countview, driver, url, description=url)
+        except PermanentFailure as e:
+            self.logger.warning(f"Skipping {url}: {e}")
+            return None
+        self.logger.info(f"Fetched {play_count} streams from {url} ({format_bytes(page_bytes(driver))})")
+        return play_count
+
+    def _fetch_song(self, song, driver=None, deferred=None):
+        """
+        Fetch one song's play count in the browser. If retries run out, the song is appended
+        to deferred (when given) so it can be tried again at the end of the run.
+        """
+        try:
+            return self._fetch_countview_from_url(song[1], driver)
+        except RetriesExhausted as e:
+            if deferred is None:
+                self.logger.error(f"Failed to fetch play count from {song[1]}: {e}")
             else:
-                self.logger.error(f"Failed to fetch play count from {url} after {self.max_retries} retries: {e}")
-                return None
+                self.logger.warning(f"Deferring {song[1]} to the end of the run: {e}")
+                deferred.append(song)
+            return None
 
-    def _fetch_countviews_in_batch(self, urls):
+    def _fetch_countviews(self, songs):
         """
-        Fetch play counts for a batch of Spotify song URLs.
+        Fetch play counts for songs: over HTTP first when enabled, then in the browser, in
+        parallel when more than one worker is configured. Songs that keep failing are set
+        aside and retried once more after everything else has been fetched.
 
         Args:
-            urls (list): List of Spotify song URLs.
+            songs (list): Tuples of (song_id, spotify_url, artist_id).
 
-        Returns:
-            dict: Dictionary mapping URLs to their play counts.
+        Yields:
+            tuple: (song, play count or None), in completion order.
         """
-        countview_data = {}
-        for url in urls:
-            countview = self._fetch_countview_from_url(url)
-            if countview is not None:
-                countview_data[url] = countview
-        return countview_data
+        if self.http_extractor is not None:
+            failures = []
+            yield from self._fetch_countviews_over_http(songs, failures)
+            songs = failures
+            if songs:
+                self.logger.info(f"Falling back to the browser for {len(songs)} songs")
+
+        deferred = []
+        yield from self._fetch_countviews_in_browser(songs, deferred)
+        if deferred:
+            self.logger.info(f"Retrying {len(deferred)} deferred songs")
+            yield from self._fetch_countviews_in_browser(deferred)
 
-    def _save_countview_to_db(self, song_id, artist_id, countview):
+    def _fetch_countviews_in_browser(self, songs, deferred=None):
+        """Fetch play counts with Selenium, skipping results for songs that were deferred."""
+        if self.workers <= 1:
+            results = ((song, self._fetch_song(song, deferred=deferred)) for song in songs)
+        else:
+            pool = BrowserPool(self._setup_driver, workers=self.workers)
+            results = pool.run(lambda driver, song: self._fetch_song(song, driver, deferred), songs)
+
+        for song, countview in results:
+            if countview is None and deferred is not None and song in deferred:
+                continue
+            yield song, countview
+
+    def _fetch_countviews_over_http(self, songs, failures):
         """
-        Save the play count to the database with song and album info.
+        Fetch play counts without a browser. Yields (song, play count) for every page that
+        could be parsed, (song, None) for tracks that no longer exist, and appends the other
+        songs to failures.
         """
-        if isinstance(countview, int):
-            connection = self.db_connector.connect()
-            cursor = connection.cursor()
+        def fetch(song):
             try:
-                # First get song and album info
-                cursor.execute("""
-                    SELECT s.name, a.name, s.album_id 
-                    FROM songs s
-                    LEFT JOIN albums a ON s.album_id = a.album_id
-                    WHERE s.song_id = %s
-                """, (song_id,))
-                song_info = cursor.fetchone()
-
-                song_name = song_info[0] if song_info else None
-                album_name = song_info[1] if song_info else None
-                album_id = song_info[2] if song_info else None
-
-                query = """
-                    INSERT INTO spotify_song_countview 
-                    (song_id, artist_id, countview, song_name, album_name, album_id)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(query, (song_id, artist_id, countview, song_name, album_name, album_id))
+                return self.http_extractor.fetch_playcount(song[1]), False
+            except PermanentFailure as e:
+                self.logger.warning(f"Skipping {song[1]}: {e}")
+                return None, True
+
+        with ThreadPoolExecutor(max_workers=self.http_workers) as executor:
+            for song, (play_count, missing) in zip(songs, executor.map(fetch, songs)):
+                if missing:
+                    yield song, None
+                elif play_count is None:
+                    failures.append(song)
+                else:
+                    self.logger.info(f"Fetched {play_count} streams from {song[1]} over HTTP")
+                    yield song, play_count
+
+    def _save_countviews_to_db(self, countviews, song_details, checkpoint=None):
+        """
+        Save several play counts with one multi-row insert.
+
+        Args:
+            countviews (list): Tuples of (song_id, artist_id, countview).
+            song_details (dict): Song name/album info keyed by song ID, from Song.get_countview_details.
+            checkpoint (ScrapeCheckpoint): Run checkpoint to mark the songs done in the same transaction.
+        """
+        rows = []
+        for song_id, artist_id, countview in countviews:
+            song_info = song_details.get(song_id, {})
+            rows.append({
+                "song_id": song_id,
+                "artist_id": artist_id,
+                "countview": countview,
+                "song_name": song_info.get("song_name"),
+                "album_name": song_info.get("album_name"),
+                "album_id": song_info.get("album_id"),
+            })
+        if not rows:
+            return
+        with self.db_connector.checkout() as connection:
+            try:
+                CountviewLatest.upsert(self.db_connector, "spotify_song_countview", rows, connection)
+                self.db_connector.insert_many("spotify_song_countview", rows, commit=False, connection=connection)
+                if checkpoint is not None:
+                    checkpoint.mark([row["song_id"] for row in rows], connection=connection)
                 connection.commit()
-                self.logger.info(f"Saved {countview} streams for song ID {song_id}")
+                self.logger.info(f"Saved streams for {len(rows)} songs")
             except Exception as e:
-                self.logger.error(f"Error saving countview for song ID {song_id}: {e}")
+                self.logger.error(f"Error saving countviews for song IDs {[row['song_id'] for row in rows]}: {e}")
                 connection.rollback()
-            finally:
-                cursor.close()
-                connection.close()
-        else:
-            self.logger.warning(f"Invalid countview data for song ID {song_id}: {countview}")
 
     def _get_songs_with_spotify_url(self):
         """
@@ -139,44 +234,67 @@ class SpotifySongsCountView:
         Returns:
             list: List of tuples containing song_id, spotify_url, and artist_id.
         """
-        connection = self.db_connector.connect()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("""
-                SELECT s.song_id, s.spotify_url, s.main_artist_id
-                FROM songs s
-                WHERE s.spotify_url IS NOT NULL
-            """)
-            return cursor.fetchall()
-        except Exception as e:
-            self.logger.error(f"Error fetching songs from the database: {e}")
-            return []
-        finally:
-            cursor.close()
-            connection.close()
+        with self.db_connector.checkout() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("""
+                    SELECT s.song_id, s.spotify_url, s.main_artist_id
+                    FROM songs s
+                    WHERE s.spotify_url IS NOT NULL
+                    ORDER BY s.song_id
+                """)
+                return cursor.fetchall()
+            except Exception as e:
+                self.logger.error(f"Error fetching songs from the database: {e}")
+                return []
+            finally:
+                cursor.close()
 
-    def update_all_songs_countview(self):
+    def update_all_songs_countview(self, song_ids=None):
         """
         Update play counts for all songs in the database.
+
+        Progress is checkpointed, so a run that crashed or was restarted resumes with the songs
+        it had not saved yet. Songs captured within the snapshot window are skipped.
+
+        Args:
+            song_ids (iterable): Only update these songs, e.g. as picked by RefreshScheduler.
+                They are refreshed even if they were captured within the snapshot window.
         """
         songs = self._get_songs_with_spotify_url()
+        if song_ids is not None:
+            wanted = set(song_ids)
+            songs = [song for song in songs if song[0] in wanted]
         if not songs:
             self.logger.warning("No songs with Spotify URLs found in the database.")
             return
 
-        for i in range(0, len(songs), self.batch_size):
-            batch = songs[i:i + self.batch_size]
-            song_ids = [song_id for song_id, _, _ in batch]
-            song_urls = [spotify_url for _, spotify_url, _ in batch]
-            artist_ids = [artist_id for _, _, artist_id in batch]
-
-            countview_data = self._fetch_countviews_in_batch(song_urls)
+        job = "spotify_songs_countview" if song_ids is None else "spotify_songs_countview_scheduled"
+        checkpoint = ScrapeCheckpoint(self.db_connector, job, self.snapshot_window_hours)
+        checkpoint.start(len(songs))
+        captured = checkpoint.completed_items()
+        if song_ids is None:
+            captured |= checkpoint.recently_captured("spotify_song_countview", "song_id", "scraped_at")
+        remaining = [song for song in songs if song[0] not in captured]
+        if len(remaining) < len(songs):
+            self.logger.info(f"Skipping {len(songs) - len(remaining)} songs already captured; {len(remaining)} left.")
 
-            for song_id, song_url, artist_id in zip(song_ids, song_urls, artist_ids):
-                countview = countview_data.get(song_url)
-                if countview is not None:
-                    self._save_countview_to_db(song_id, artist_id, countview)
+        song_details = Song.get_countview_details(self.db_connector)
 
-        self.driver.quit()
+        pending = []
+        failed = []
+        try:
+            for (song_id, _, artist_id), countview in self._fetch_countviews(remaining):
+                if isinstance(countview, int):
+                    pending.append((song_id, artist_id, countview))
+                else:
+                    failed.append(song_id)
+                if len(pending) >= self.batch_size:
+                    self._save_countviews_to_db(pending, song_details, checkpoint)
+                    pending = []
+            self._save_countviews_to_db(pending, song_details, checkpoint)
+            checkpoint.mark(failed, ScrapeCheckpoint.FAILED)
+            checkpoint.finish()
+        finally:
+            self._quit_driver()
         self.logger.info("Finished updating play counts for all songs.")
-
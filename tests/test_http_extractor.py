@@ -0,0 +1,79 @@
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.scapers.http_extractor import SpotifyPageExtractor
+from src.scapers.scrape_errors import PermanentFailure
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+TRACK_ID = "4uLU6hMCjMI75M1A2tKUQC"
+ARTIST_ID = "0gxyHStUsqpMadRV0Di1Qt"
+
+# Request path -> saved page served for it
+PAGES = {
+    f"/track/{TRACK_ID}": "spotify_track.html",
+    f"/artist/{ARTIST_ID}": "spotify_artist.html",
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        fixture = PAGES.get(self.path)
+        if fixture is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(os.path.join(FIXTURES_DIR, fixture), "rb") as page:
+            body = page.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SpotifyPageExtractorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.extractor = SpotifyPageExtractor(timeout=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.extractor.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_track_playcount_comes_from_the_requested_track(self):
+        # The album tracklist embedded before the track carries another track's play count
+        self.assertEqual(self.extractor.fetch_playcount(f"{self.base_url}/track/{TRACK_ID}"), 1234567890)
+
+    def test_track_playcount_is_none_when_the_track_is_not_on_the_page(self):
+        self.assertIsNone(SpotifyPageExtractor.parse_playcount(self._fixture("spotify_track.html"), "unknown"))
+
+    def test_artist_monthly_listeners_come_from_the_requested_artist(self):
+        self.assertEqual(self.extractor.fetch_monthly_listeners(f"{self.base_url}/artist/{ARTIST_ID}"), 12345678)
+
+    def test_artist_monthly_listeners_are_none_without_the_artist_entry(self):
+        # The related artists embedded in the page have monthly listeners of their own
+        self.assertIsNone(SpotifyPageExtractor.parse_monthly_listeners(self._fixture("spotify_artist.html"), "unknown"))
+        self.assertIsNone(SpotifyPageExtractor.parse_monthly_listeners(self._fixture("spotify_artist.html")))
+
+    def test_missing_page_is_a_permanent_failure(self):
+        with self.assertRaises(PermanentFailure):
+            self.extractor.fetch_playcount(f"{self.base_url}/track/doesnotexist")
+
+    @staticmethod
+    def _fixture(name):
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as page:
+            return page.read()
+
+
+if __name__ == "__main__":
+    unittest.main()